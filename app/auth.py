@@ -1,18 +1,140 @@
-from app.database import SessionLocal
+from app.database import SessionLocal, session_scope
 from app.models import User
+from app.metrics import timed, count_error
+from sqlalchemy.orm import joinedload
+from collections import deque
 import bcrypt
+import json
+import os
+import threading
+import time
 
-# مصادقة المستخدم
-def auth_user(u, p):
+# كلفة bcrypt؛ كلمات المرور بكلفة مختلفة يُعاد تشفيرها تلقائياً عند الدخول
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# عدد عمليات bcrypt المتزامنة في العملية: موجة دخول لا تستهلك كل المعالج
+_hash_slots = threading.BoundedSemaphore(int(os.environ.get("AUTH_HASH_WORKERS", 2)))
+
+# أكواد التفعيل لكل صفة: ACTIVATION_CODES (JSON) أولاً ثم st.secrets["activation_codes"]
+# بدون إعداد تبقى القائمة فارغة ويُرفض كل تسجيل ذاتي
+def _load_activation_codes():
+    raw = os.environ.get("ACTIVATION_CODES")
+    if raw:
+        return json.loads(raw)
+    try:
+        import streamlit as st
+        return dict(st.secrets.get("activation_codes", {}))
+    except Exception:
+        return {}
+
+ACTIVATION_CODES = _load_activation_codes()
+
+# تقييد محاولات الدخول الفاشلة لكل اسم مستخدم ولكل عنوان IP
+# limits: الحد لكل نوع مفتاح؛ حد العنوان أعلى لأن عنواناً واحداً قد يجمع مستخدمين كثيرين (NAT، موجه Heroku)
+# max_keys: سقف عدد المفاتيح المتتبعة؛ عند بلوغه تُحذف المنتهية ثم الأقدم نشاطاً
+class LoginThrottle:
+    def __init__(self, limits, window=300, max_keys=10_000):
+        self.limits = dict(limits)
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        attempts = self._failures.get(key)
+        if attempts is None:
+            return 0
+        while attempts and attempts[0] < now - self.window:
+            attempts.popleft()
+        if not attempts:
+            self._failures.pop(key, None)
+            return 0
+        return len(attempts)
+
+    def _prune(self, now):
+        for key in list(self._failures):
+            self._recent(key, now)
+        # المفاتيح مرتبة حسب آخر فشل، فالأولى هي الأقدم نشاطاً
+        while len(self._failures) >= self.max_keys:
+            self._failures.pop(next(iter(self._failures)))
+
+    def is_blocked(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            return any(self._recent(k, now) >= self.limits[k[0]] for k in keys)
+
+    def record_failure(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            for k in keys:
+                attempts = self._failures.pop(k, None)
+                if attempts is None:
+                    if len(self._failures) >= self.max_keys:
+                        self._prune(now)
+                    attempts = deque()
+                attempts.append(now)
+                self._failures[k] = attempts
+
+    def reset(self, *keys):
+        with self._lock:
+            for k in keys:
+                self._failures.pop(k, None)
+
+login_throttle = LoginThrottle(
+    limits={
+        'user': int(os.environ.get("LOGIN_MAX_ATTEMPTS", 5)),
+        'ip': int(os.environ.get("LOGIN_IP_MAX_ATTEMPTS", 100)),
+    },
+    window=int(os.environ.get("LOGIN_WINDOW_SECONDS", 300)),
+    max_keys=int(os.environ.get("LOGIN_THROTTLE_MAX_KEYS", 10_000)),
+)
+
+def _throttle_keys(u, ip):
+    keys = [('user', u)]
+    if ip:
+        keys.append(('ip', ip))
+    return keys
+
+# هل تجاوز اسم المستخدم أو العنوان حد المحاولات؟
+def is_login_throttled(u, ip=None):
+    return login_throttle.is_blocked(*_throttle_keys(u, ip))
+
+# تشفير كلمة المرور بالكلفة المضبوطة
+def hash_password(p):
+    with _hash_slots:
+        return bcrypt.hashpw(p.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+def _check_password(p, h):
+    with _hash_slots:
+        return bcrypt.checkpw(p.encode(), h.encode())
+
+# كلفة bcrypt المخزنة داخل التجزئة ($2b$12$...)
+def _hash_rounds(h):
+    try:
+        return int(h.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+# مصادقة المستخدم (تُرجع معرف المستخدم أو None)
+@timed("auth_user")
+def auth_user(u, p, ip=None):
+    keys = _throttle_keys(u, ip)
+    # الرفض قبل أي عملية تشفير عند تجاوز حد المحاولات
+    if login_throttle.is_blocked(*keys):
+        return None
     s = SessionLocal()
     try:
-        # البحث عن المستخدم بناءً على اسم المستخدم
-        user = s.query(User).filter(User.username == u).first()
+        # تحميل المعرف والتجزئة فقط
+        row = s.query(User.id, User.password_hash).filter(User.username == u).first()
         # التحقق من كلمة المرور باستخدام bcrypt
-        if user and bcrypt.checkpw(p.encode(), user.password_hash.encode()):
-            return user
+        if row and row.password_hash and _check_password(p, row.password_hash):
+            login_throttle.reset(*keys)
+            if _hash_rounds(row.password_hash) != BCRYPT_ROUNDS:
+                s.query(User).filter(User.id == row.id).update({User.password_hash: hash_password(p)})
+                s.commit()
+            return row.id
+        login_throttle.record_failure(*keys)
     except Exception as e:
-        pass
+        count_error("auth_user", e)
     finally:
         s.close()
     return None
@@ -20,7 +142,7 @@ def auth_user(u, p):
 # تسجيل مستخدم جديد
 def register_user_secure(u, f, p, role, code, t_id, d_id, m_type):
     # التحقق من كود التفعيل
-    if code != ACTIVATION_CODES.get(role):
+    if not code or code != ACTIVATION_CODES.get(role):
         return False, "⛔ كود التفعيل غير صحيح!"
     
     s = SessionLocal()
@@ -30,7 +152,7 @@ def register_user_secure(u, f, p, role, code, t_id, d_id, m_type):
             return False, "⚠️ اسم المستخدم موجود"
         
         # تشفير كلمة المرور
-        h = bcrypt.hashpw(p.encode(), bcrypt.gensalt()).decode()
+        h = hash_password(p)
         
         # إضافة المستخدم الجديد إلى قاعدة البيانات
         s.add(User(username=u, full_name=f, password_hash=h, role=role, team_id=t_id, department_id=d_id, member_type=m_type))
@@ -38,6 +160,7 @@ def register_user_secure(u, f, p, role, code, t_id, d_id, m_type):
         return True, "✅ تم الإنشاء"
     
     except Exception as e:
+        count_error("register_user_secure", e)
         s.rollback()
         return False, f"خطأ: {str(e)}"
     finally:
@@ -52,15 +175,74 @@ def add_user_manual(u, f, p, role, t_id, d_id, m_type):
             return False, "⚠️ اسم المستخدم موجود مسبقاً"
         
         # تشفير كلمة المرور
-        h = bcrypt.hashpw(p.encode(), bcrypt.gensalt()).decode()
+        h = hash_password(p)
         
         # إضافة المستخدم الجديد إلى قاعدة البيانات
-        s.add(User(username=u, full_name=f, password_hash=h, role=role, team_id=t_id, department_id=d_id, member_type=m_type))
+        new_user = User(username=u, full_name=f, password_hash=h, role=role, team_id=t_id, department_id=d_id, member_type=m_type)
+        s.add(new_user)
         s.commit()
         return True, "✅ تمت الإضافة"
     
     except Exception as e:
+        count_error("add_user_manual", e)
         s.rollback()
         return False, "خطأ في إضافة المستخدم"
     finally:
         s.close()
+
+# تحميل المستخدم مع فرقته وقسمه في استعلام واحد (بدون تحميل كسول لاحق)
+def load_user_identity(uid):
+    with session_scope() as s:
+        return s.query(User).options(joinedload(User.team), joinedload(User.department)).filter(User.id == uid).first()
+
+# لقطة ثابتة وخفيفة لهوية المستخدم الحالي (بدل كائن ORM في حالة الجلسة)
+class CurrentUser:
+    __slots__ = ('id', 'username', 'full_name', 'role', 'member_type',
+                 'team_id', 'team_name', 'department_id', 'department_name', 'version')
+
+    def __init__(self, id, username, full_name, role, member_type, team_id, team_name, department_id, department_name, version=0):
+        for name, value in zip(self.__slots__, (id, username, full_name, role, member_type, team_id, team_name, department_id, department_name, version)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CurrentUser غير قابل للتعديل")
+
+    def __delattr__(self, name):
+        raise AttributeError("CurrentUser غير قابل للتعديل")
+
+    def __reduce__(self):
+        return (CurrentUser, tuple(getattr(self, n) for n in self.__slots__))
+
+    def __repr__(self):
+        return f"CurrentUser(id={self.id!r}, username={self.username!r}, role={self.role!r}, version={self.version!r})"
+
+    @classmethod
+    def from_user(cls, user, version=0):
+        return cls(
+            user.id, user.username, user.full_name, user.role, user.member_type,
+            user.team_id, user.team.name if user.team else None,
+            user.department_id, user.department.name_ar if user.department else None,
+            version,
+        )
+
+# أرقام إصدار الهوية لكل مستخدم: تزداد عند تعديل صفه فتُحدّث اللقطات القديمة
+_identity_versions = {}
+_identity_lock = threading.Lock()
+
+def identity_version(uid):
+    return _identity_versions.get(uid, 0)
+
+def bump_identity_version(uid):
+    with _identity_lock:
+        _identity_versions[uid] = _identity_versions.get(uid, 0) + 1
+
+# المستخدم الحالي لجلسة Streamlit: لقطة تُحمّل مرة واحدة ولا تُحدّث إلا عند تغير صف المستخدم
+def get_current_user(state):
+    uid = state.get('user_id')
+    snap = state.get('current_user')
+    version = identity_version(uid)
+    if snap is None or snap.id != uid or snap.version != version:
+        user = load_user_identity(uid)
+        snap = CurrentUser.from_user(user, version) if user else None
+        state['current_user'] = snap
+    return snap
@@ -0,0 +1,119 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# سجل جميع الذاكرات المؤقتة في العملية لعرض الإحصائيات وإبطالها معاً
+_CACHES = {}
+_versions = {}
+_versions_lock = threading.Lock()
+
+# تقدير حجم القيمة بالبايت (DataFrame أو bytes أو مخطط plotly أو غيرها)
+def estimate_size(value):
+    usage = getattr(value, 'memory_usage', None)
+    if usage is not None:
+        try:
+            return int(usage(deep=True).sum())
+        except Exception:
+            pass
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    # كائنات plotly: getsizeof لا يرى البيانات والتخطيط، فحجم JSON أقرب تقدير
+    to_json = getattr(value, 'to_json', None)
+    if to_json is not None:
+        try:
+            return len(to_json())
+        except Exception:
+            pass
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    return sys.getsizeof(value)
+
+# ذاكرة مؤقتة مشتركة بين الجلسات مع مدة صلاحية وإخلاء LRU محدود بالحجم (وبعدد المدخلات اختيارياً)
+class ScopedCache:
+    def __init__(self, name, ttl=300, max_bytes=256 * 1024 * 1024, max_entries=None):
+        self.name = name
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _CACHES[name] = self
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            # إخلاء الأقدم استخداماً حتى نعود تحت الحد
+            while self._bytes > self.max_bytes or (self.max_entries and len(self._entries) > self.max_entries):
+                old_key = next(iter(self._entries))
+                self._drop(old_key)
+                self.evictions += 1
+        return value
+
+    # إبطال المفاتيح التي تخص النطاقات المعطاة (المفتاح نفسه أو عنصره الأول)
+    def invalidate(self, scopes):
+        scopes = set(scopes)
+        with self._lock:
+            for key in list(self._entries):
+                if key in scopes or (isinstance(key, tuple) and key and key[0] in scopes):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+# رقم إصدار بيانات النطاق (يزداد مع كل كتابة تمسه)
+def data_version(scope):
+    return _versions.get(scope, 0)
+
+# إبطال النطاقات في جميع الذاكرات المؤقتة بعد عملية كتابة
+def invalidate_scopes(scopes):
+    scopes = list(scopes)
+    with _versions_lock:
+        for scope in scopes:
+            _versions[scope] = _versions.get(scope, 0) + 1
+    for cache in list(_CACHES.values()):
+        cache.invalidate(scopes)
+
+# إحصائيات الإصابة والإخفاق لكل ذاكرة مؤقتة
+def cache_stats():
+    return {name: cache.stats() for name, cache in _CACHES.items()}
@@ -0,0 +1,44 @@
+from app.cache import ScopedCache
+import os
+import plotly.express as px
+
+# المخططات الجاهزة حسب (النطاق، المرشحات): تُبنى من جداول التجميع فقط وليس من صفوف الأعمال
+# المفاتيح تشمل نطاقات تواريخ حرة، لذا يُحد عدد المدخلات إضافة إلى الحجم
+figure_cache = ScopedCache("figures", ttl=int(os.environ.get("DATASET_CACHE_TTL", 300)), max_bytes=16 * 1024 * 1024, max_entries=256)
+
+def leaderboard_figure(top_researchers):
+    return px.bar(top_researchers, x='points', y='researcher', orientation='h', title="🥇 أكثر الباحثين تميزاً (حسب النقاط)", text_auto=True, color_discrete_sequence=['#fbbf24'])
+
+def structure_figure(structure):
+    fig = px.treemap(
+        structure,
+        path=['department', 'team'],
+        values='points',
+        title="🧬 مساهمة الهياكل (خريطة شجرية)",
+        color='department',
+        color_discrete_sequence=px.colors.qualitative.Prism
+    )
+    fig.update_traces(textinfo="label+value+percent entry")
+    return fig
+
+def types_figure(types):
+    return px.pie(types, names='activity_type', values='count', hole=0.5, color_discrete_sequence=px.colors.sequential.Blues_r)
+
+def yearly_figure(yearly):
+    return px.bar(yearly, x='year', y='count', text_auto=True, color_discrete_sequence=['#2563eb'])
+
+# مخططات لوحة القيادة من نتيجة dashboard_aggregates (حجمها ثابت مهما زاد عدد الأعمال)
+# مخططات التوزيع تُحذف (None) عند عدم وجود أعمال مطابقة
+def dashboard_figures(scope, aggs, **filters):
+    key = (scope, tuple(sorted(filters.items())))
+    cached = figure_cache.get(key)
+    if cached is not None:
+        return cached
+    has_works = bool(aggs['total'])
+    figures = {
+        'leaderboard': leaderboard_figure(aggs['top_researchers']),
+        'structure': structure_figure(aggs['structure']) if has_works else None,
+        'types': types_figure(aggs['types']) if has_works else None,
+        'yearly': yearly_figure(aggs['yearly']) if has_works else None,
+    }
+    return figure_cache.set(key, figures)
@@ -0,0 +1,121 @@
+from app.database import get_engine
+from app.auth import CurrentUser
+from app.services import build_scoped_query, UNASSIGNED
+from app.pdf_utils import cv_identity, ensure_font_exists, process_text_for_pdf, render_cv_pdf
+from sqlalchemy import text
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import io
+import os
+import re
+import threading
+import zipfile
+import pandas as pd
+
+# أعضاء النطاق مع أسماء هياكلهم
+MEMBERS_QUERY = """
+SELECT u.id, u.username, u.full_name, u.role, u.member_type, u.team_id, t.name AS team, u.department_id, d.name_ar AS department
+FROM users u
+LEFT JOIN teams t ON u.team_id = t.id
+LEFT JOIN departments d ON u.department_id = d.id
+"""
+# أعمال جميع أعضاء النطاق في استعلام واحد
+MEMBER_WORKS_QUERY = """
+SELECT w.user_id, w.title, w.activity_type, w.publication_date, w.year
+FROM works w
+JOIN users u ON w.user_id = u.id
+"""
+# في استعلام الأعضاء يُقيد نطاق الباحث بمعرف المستخدم نفسه
+MEMBER_SCOPE_COLUMNS = {'department': "u.department_id", 'team': "u.team_id", 'user': "u.id"}
+
+# عدد عمليات التوليد في العملية كلها (مشترك بين مهام التصدير المتزامنة)؛ نترك نواة للجلسات التفاعلية
+CV_BATCH_WORKERS = int(os.environ.get("CV_BATCH_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# تجمع العمليات المشترك (يُنشأ عند أول مهمة)
+def _cv_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=CV_BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_warm_worker)
+        return _pool
+
+# إسقاط التجمع بعد تعطله (موت عملية عاملة) ليُنشأ من جديد في المهمة التالية
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+# اسم ملف آمن داخل الأرشيف: بدون فواصل مسارات أو محارف تحكم
+def _safe_filename(name):
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', str(name)).strip('. ') or 'user'
+
+# تهيئة كل عملية عاملة مرة واحدة: الخط ومكتبة إعادة التشكيل
+def _warm_worker():
+    ensure_font_exists()
+    process_text_for_pdf("السيرة الذاتية الأكاديمية")
+
+def _render_member(identity, df_works):
+    return render_cv_pdf(*identity, df_works)
+
+# تحميل أعضاء النطاق وأعمالهم مجمعة حسب user_id
+def load_scope_members(scope):
+    kind, scope_id = scope
+    where, params = "", {}
+    if kind != 'admin':
+        where, params = f" WHERE {MEMBER_SCOPE_COLUMNS[kind]} = :scope_id", {'scope_id': scope_id}
+    members = pd.read_sql(text(MEMBERS_QUERY + where), get_engine(), params=params)
+    q, params = build_scoped_query(scope, base_q=MEMBER_WORKS_QUERY)
+    works = pd.read_sql(q, get_engine(), params=params)
+    works['activity_type'] = works['activity_type'].fillna(UNASSIGNED)
+    works['publication_date'] = pd.to_datetime(works['publication_date']).dt.date
+    return members, {uid: g.drop(columns='user_id') for uid, g in works.groupby('user_id')}
+
+# لقطة هوية العضو من صف الاستعلام (القيم الفارغة تصل NaN من pandas)
+def _member_identity(m):
+    clean = lambda v: None if pd.isna(v) else v
+    member = CurrentUser(m.id, m.username, m.full_name, m.role, clean(m.member_type),
+                         clean(m.team_id), clean(m.team), clean(m.department_id), clean(m.department))
+    return cv_identity(member)
+
+# إنشاء السير الذاتية لكل أعضاء النطاق بالتوازي وجمعها في ملف ZIP واحد
+# output: مسار ملف أو كائن ملف (افتراضياً BytesIO)، progress(done, total) للتقدم
+# workers: تجمع خاص بعدد محدد من العمليات (للقياس)؛ افتراضياً التجمع المشترك المحدود بـ CV_BATCH_WORKERS
+def generate_scope_cvs(scope, output=None, workers=None, progress=None):
+    members, works_by_user = load_scope_members(scope)
+    output = output if output is not None else io.BytesIO()
+    empty = pd.DataFrame(columns=['title', 'activity_type', 'publication_date', 'year'])
+    total = len(members)
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=_warm_worker) as pool:
+            _write_cvs(pool, members, works_by_user, empty, output, total, progress)
+        return output
+    pool = _cv_pool()
+    try:
+        _write_cvs(pool, members, works_by_user, empty, output, total, progress)
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    return output
+
+def _write_cvs(pool, members, works_by_user, empty, output, total, progress):
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as zf:
+        futures = {
+            pool.submit(_render_member, _member_identity(m), works_by_user.get(m.id, empty)): m.username
+            for m in members.itertuples()
+        }
+        # كل ملف يُكتب في الأرشيف فور اكتماله
+        for done, fut in enumerate(as_completed(futures), 1):
+            zf.writestr(f"cv_{_safe_filename(futures[fut])}.pdf", fut.result())
+            if progress:
+                progress(done, total)
+
+# محتوى أرشيف السير الذاتية كبايتات (لمهام التصدير في الخلفية)
+def scope_cvs_zip(scope, workers=None, progress=None):
+    return generate_scope_cvs(scope, workers=workers, progress=progress).getvalue()
@@ -1,18 +1,145 @@
-from sqlalchemy import create_engine, inspect
-from sqlalchemy.orm import sessionmaker
-from app.models import Base
-import streamlit as st
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.orm import sessionmaker, declarative_base
+from app.metrics import instrument_engine
 
-# إعداد الاتصال بقاعدة البيانات
-def get_db_engine():
-    try:
-        db_config = st.secrets["db"]
-        DATABASE_URL = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['name']}?sslmode=require"
-        return create_engine(DATABASE_URL, pool_pre_ping=True)
-    except Exception as e:
-        st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {e}")
-        return None
+# القاعدة المشتركة لجميع النماذج
+Base = declarative_base()
+
+# إعدادات تجمع الاتصالات (قابلة للتغيير بمتغيرات البيئة)
+# بدلاً من pool_pre_ping عند كل استعارة نعتمد على إعادة تدوير الاتصالات القديمة
+POOL_SETTINGS = {
+    'pool_size': int(os.environ.get("DB_POOL_SIZE", 10)),
+    'max_overflow': int(os.environ.get("DB_MAX_OVERFLOW", 20)),
+    'pool_recycle': int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+    'pool_timeout': int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+    'pool_pre_ping': os.environ.get("DB_POOL_PRE_PING", "0") == "1",
+}
+
+# عدادات استعارة الاتصالات وزمن الانتظار
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.waits = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'avg_wait_ms': round(self.wait_seconds / self.waits * 1000, 3) if self.waits else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+            }
+
+pool_metrics = PoolMetrics()
+
+# تجمع QueuePool يقيس زمن انتظار الحصول على اتصال
+class TimedQueuePool(QueuePool):
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - t0)
 
-engine = get_db_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# رابط قاعدة البيانات: DATABASE_URL أولاً (للتجارب المحلية) ثم st.secrets
+def get_database_url():
+    url = os.environ.get("DATABASE_URL")
+    if url:
+        return url
+    import streamlit as st
+    db_config = st.secrets["db"]
+    return f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['name']}?sslmode=require"
 
+# تسلسل JSON بالحروف العربية كما هي (لا \\uXXXX) حتى تطابق json_extract المفاتيح العربية في SQLite
+def _json_dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+# إنشاء محرك بإعدادات تجمع قابلة للتخصيص
+def create_db_engine(url=None, **overrides):
+    url = url or get_database_url()
+    options = dict(POOL_SETTINGS, **overrides)
+    if make_url(url).get_backend_name() == "sqlite" and make_url(url).database in (None, "", ":memory:"):
+        # قاعدة SQLite في الذاكرة لا تدعم تجمع QueuePool
+        options = {'pool_pre_ping': options['pool_pre_ping']}
+    else:
+        options['poolclass'] = TimedQueuePool
+    eng = create_engine(url, json_serializer=_json_dumps, **options)
+    event.listen(eng, "connect", lambda *a: pool_metrics.incr('connects'))
+    event.listen(eng, "checkout", lambda *a: pool_metrics.incr('checkouts'))
+    event.listen(eng, "checkin", lambda *a: pool_metrics.incr('checkins'))
+    return instrument_engine(eng)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# المحرك المشترك للعملية (يُنشأ عند أول استخدام وليس عند الاستيراد)
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_db_engine()
+    return _engine
+
+# استبدال المحرك المشترك (للتجارب المحلية واختبارات التحميل)
+def configure_engine(url=None, **overrides):
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = create_db_engine(url, **overrides)
+    return _engine
+
+# حالة التجمع الحالية مع عدادات الاستعارة والانتظار
+def pool_status():
+    status = pool_metrics.snapshot()
+    if _engine is not None and isinstance(_engine.pool, QueuePool):
+        status.update(size=_engine.pool.size(), checked_out=_engine.pool.checkedout(), overflow=_engine.pool.overflow())
+    return status
+
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+# إنشاء جلسة مرتبطة بالمحرك المشترك
+def SessionLocal(**kw):
+    return _session_factory(bind=get_engine(), **kw)
+
+# جلسة لكل وحدة عمل: تثبيت عند النجاح، تراجع عند الخطأ، وإغلاق مضمون
+# (الكائنات تبقى مقروءة بعد الإغلاق لأن expire_on_commit معطل)
+@contextmanager
+def session_scope():
+    s = SessionLocal(expire_on_commit=False)
+    try:
+        yield s
+        s.commit()
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        s.close()
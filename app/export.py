@@ -0,0 +1,75 @@
+from app.database import get_engine
+from app.services import build_scoped_query, dashboard_filter_conditions, UNASSIGNED
+from app.metrics import timed, count_error
+import io
+import json
+from datetime import date, datetime
+
+# عدد الصفوف المقروءة من المؤشر في كل دفعة
+EXPORT_CHUNK_SIZE = 2000
+
+# الأعمدة المصدرة فقط (دون بقية أعمدة لوحة القيادة)
+EXPORT_QUERY = f"""
+SELECT w.title, COALESCE(w.activity_type, '{UNASSIGNED}') AS activity_type, w.publication_date, w.points,
+    u.full_name AS researcher, COALESCE(t.name, '{UNASSIGNED}') AS team, w.details
+FROM works w
+JOIN users u ON w.user_id = u.id
+LEFT JOIN teams t ON u.team_id = t.id
+"""
+EXPORT_HEADERS = ['العنوان', 'النوع', 'التاريخ', 'النقاط', 'الباحث', 'الفرقة', 'تفاصيل']
+
+# فك نصوص JSON لدفعة كاملة باستدعاء json.loads واحد (مع احتياط لكل قيمة عند الخطأ)
+def _decode_batch(texts):
+    parts = [t if t.strip() else "null" for t in texts]
+    try:
+        return json.loads("[" + ",".join(parts) + "]")
+    except ValueError:
+        decoded = []
+        for p in parts:
+            try:
+                decoded.append(json.loads(p))
+            except ValueError:
+                decoded.append(None)
+        return decoded
+
+# تنسيق تفاصيل دفعة من الصفوف (JSONB يصل كقاموس، ونص JSON في SQLite)
+def _format_details_batch(values):
+    decoded_texts = iter(_decode_batch([v for v in values if isinstance(v, str)]))
+    decoded = [next(decoded_texts) if isinstance(v, str) else v for v in values]
+    return [" | ".join(f"{k}:{v}" for k, v in d.items() if v) if isinstance(d, dict) else "" for d in decoded]
+
+# كتابة الصفوف تدريجياً من مؤشر الخادم إلى ملف في وضع constant_memory
+def _write_workbook(output, scope, filters):
+    import xlsxwriter
+    conds, params = dashboard_filter_conditions(**filters)
+    q, params = build_scoped_query(scope, base_q=EXPORT_QUERY, conditions=conds, params=params)
+
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    sheet = workbook.add_worksheet('التقرير')
+    date_fmt = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    sheet.write_row(0, 0, EXPORT_HEADERS)
+    row_no = 1
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE).execute(q, params)
+        for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+            details = _format_details_batch([r.details for r in chunk])
+            for r, det in zip(chunk, details):
+                sheet.write_row(row_no, 0, (r.title, r.activity_type))
+                if isinstance(r.publication_date, date):
+                    sheet.write_datetime(row_no, 2, datetime.combine(r.publication_date, datetime.min.time()), date_fmt)
+                else:
+                    sheet.write(row_no, 2, r.publication_date)
+                sheet.write_row(row_no, 3, (r.points, r.researcher, r.team, det))
+                row_no += 1
+    workbook.close()
+
+# بناء تقرير Excel عند الطلب (التخزين حسب بصمة المحتوى يتم في app/jobs.py)
+@timed("export_works_excel")
+def export_works_excel(scope, **filters):
+    try:
+        output = io.BytesIO()
+        _write_workbook(output, scope, filters)
+        return output.getvalue()
+    except Exception as e:
+        count_error("export_works_excel", e)
+        return None
@@ -0,0 +1,132 @@
+from app.cache import ScopedCache
+from app.services import shared_smart_data, get_user_scope, UNASSIGNED
+import os
+import numpy as np
+import pandas as pd
+
+# أعمدة التصفية في لوحة القيادة (اسم المرشح -> عمود الإطار)
+FILTER_COLUMNS = {
+    'year': 'year',
+    'dept': 'department_id',
+    'team': 'team_id',
+    'atype': 'activity_type',
+}
+
+# محركات التصفية حسب النطاق (تُبطل مع بيانات النطاق)
+engine_cache = ScopedCache("filters", ttl=int(os.environ.get("DATASET_CACHE_TTL", 300)), max_bytes=64 * 1024 * 1024)
+
+# فهرس لكل قيمة: مواقع الصفوف مرتبة تصاعدياً (القيم الفارغة تحت UNASSIGNED)
+def _value_index(cat):
+    codes = cat.codes.astype(np.int64) + 1  # 0 = قيمة فارغة
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(cat.categories) + 1))))
+    values = [UNASSIGNED] + cat.categories.tolist()
+    return {values[i]: order[bounds[i]:bounds[i + 1]] for i in range(len(values)) if bounds[i + 1] > bounds[i]}
+
+# محرك تصفية تزايدي لبيانات النطاق: أعمدة فئوية مع فهرس مواقع لكل قيمة وفهرس تواريخ مرتب
+# كل تغيير في المرشحات يصبح تقاطعاً بين فهارس جاهزة دون مسح كامل للإطار
+class FilterEngine:
+    def __init__(self, df):
+        self.frame = df
+        self.size = len(df)
+        self.columns = {}
+        self._index = {}
+        for name, col in FILTER_COLUMNS.items():
+            values = df[col]
+            if values.dtype.kind == 'f':
+                values = values.astype('Int64')
+            self.columns[name] = pd.Categorical(values)
+            self._index[name] = _value_index(self.columns[name])
+        # فهرس التواريخ للأعمال المؤرخة فقط (كما في SQL: NULL لا يطابق أي نطاق تاريخ)
+        dates = pd.to_datetime(df['publication_date']).to_numpy(dtype='datetime64[D]')
+        dated = np.flatnonzero(~np.isnat(dates))
+        self._date_order = dated[np.argsort(dates[dated], kind='stable')].astype(np.int32)
+        self._sorted_dates = dates[self._date_order]
+        self._date_memo = (None, None)
+
+    # حجم الفهارس بالبايت (الإطار نفسه محسوب في ذاكرة البيانات)
+    def memory_usage(self, deep=True):
+        sizes = {name: sum(a.nbytes for a in idx.values()) for name, idx in self._index.items()}
+        sizes['dates'] = self._date_order.nbytes + self._sorted_dates.nbytes
+        return pd.Series(sizes)
+
+    # أول وآخر تاريخ في البيانات (الأعمال دون تاريخ مستبعدة)
+    def date_bounds(self):
+        if not len(self._sorted_dates):
+            return None, None
+        first, last = self._sorted_dates[0], self._sorted_dates[-1]
+        return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    # مواقع الصفوف ضمن نطاق تاريخ (آخر نطاق محفوظ لأن تغيّر بقية المرشحات أكثر تكراراً)
+    def _date_positions(self, date_from, date_to):
+        key = (date_from, date_to)
+        memo_key, memo_rows = self._date_memo
+        if memo_key == key:
+            return memo_rows
+        lo = 0 if date_from is None else np.searchsorted(self._sorted_dates, np.datetime64(date_from, 'D'), 'left')
+        hi = len(self._sorted_dates) if date_to is None else np.searchsorted(self._sorted_dates, np.datetime64(date_to, 'D'), 'right')
+        positions = np.sort(self._date_order[lo:hi])
+        self._date_memo = (key, positions)
+        return positions
+
+    # مواقع الصفوف المطابقة (بنفس دلالة dashboard_filter_conditions: السنة تتجاوز نطاق التاريخ)
+    def select(self, date_from=None, date_to=None, year=None, dept=None, team=None, atype=None):
+        parts = []
+        if year is not None:
+            parts.append(self._index['year'].get(int(year), np.empty(0, np.int32)))
+        elif date_from is not None or date_to is not None:
+            parts.append(self._date_positions(date_from, date_to))
+        for name, value in (('dept', dept), ('team', team), ('atype', atype)):
+            if value is not None:
+                parts.append(self._index[name].get(value, np.empty(0, np.int32)))
+        if not parts:
+            return np.arange(self.size, dtype=np.int32)
+        # التقاطع يبدأ بأصغر فهرس ويتوقف عند أول نتيجة فارغة
+        parts.sort(key=len)
+        rows = parts[0]
+        for other in parts[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def count(self, **filters):
+        return len(self.select(**filters))
+
+    # القيم المتاحة لمرشح معين مع عدد صفوفها، حسب بقية المرشحات (للقوائم المتتالية)
+    # السنوات أعداد فقط: الأعمال دون سنة لا تظهر كخيار
+    def options(self, name, **filters):
+        values = self._options(name, **filters)
+        if name == 'year':
+            values.pop(UNASSIGNED, None)
+        return values
+
+    def _options(self, name, **filters):
+        filters.pop(name, None)
+        if name == 'year':
+            filters.pop('date_from', None)
+            filters.pop('date_to', None)
+        cat = self.columns[name]
+        if not any(v is not None for v in filters.values()):
+            return {value: len(rows) for value, rows in self._index[name].items()}
+        codes = cat.codes[self.select(**filters)].astype(np.int64) + 1
+        counts = np.bincount(codes, minlength=len(cat.categories) + 1)
+        values = [UNASSIGNED] + cat.categories.tolist()
+        return {values[i]: int(n) for i, n in enumerate(counts) if n}
+
+    # الصفوف المطابقة كإطار بيانات
+    def rows(self, **filters):
+        return self.frame.iloc[self.select(**filters)]
+
+# محرك التصفية لبيانات نطاق المستخدم (يُعاد بناؤه فقط عند تغيّر إطار النطاق)
+def get_filter_engine(user):
+    scope = get_user_scope(user)
+    if scope is None:
+        return None
+    df = shared_smart_data(user)
+    if df.empty:
+        return None
+    engine = engine_cache.get(scope)
+    if engine is None or engine.frame is not df:
+        engine = engine_cache.set(scope, FilterEngine(df))
+    return engine
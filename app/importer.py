@@ -0,0 +1,150 @@
+from app.database import SessionLocal
+from app.models import Work, User
+from app.cache import invalidate_scopes
+from app.services import work_scopes, parse_details
+from app.summary import record_works
+from app.utils import work_search_text
+from app.metrics import timed, count_error
+import pandas as pd
+
+# أسماء الأعمدة المقبولة في ملف الاستيراد (بالعربية أو بالإنجليزية)
+IMPORT_COLUMNS = {
+    'اسم المستخدم': 'username',
+    'العنوان': 'title',
+    'النوع': 'activity_type',
+    'التصنيف': 'classification',
+    'التاريخ': 'publication_date',
+    'النقاط': 'points',
+    'تفاصيل': 'details',
+}
+REQUIRED_COLUMNS = ['username', 'title', 'activity_type', 'publication_date']
+
+# قراءة ملف Excel أو CSV دون حذف الصفوف الناقصة (التحقق يتم لاحقاً لكل صف)
+def read_works_file(file, filename=None):
+    name = (filename or getattr(file, 'name', '') or '').lower()
+    df = pd.read_csv(file) if name.endswith('.csv') else pd.read_excel(file)
+    return df.rename(columns=lambda c: IMPORT_COLUMNS.get(str(c).strip(), str(c).strip()))
+
+# قراءة التفاصيل ككائن JSON (يقبل نص JSON أو قاموساً)
+def _details_value(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return parse_details(value if isinstance(value, dict) else str(value))
+
+# هل يقع الباحث داخل نطاق المستورد؟
+def _in_scope(scope, user_row):
+    kind, scope_id = scope
+    if kind == 'admin':
+        return True
+    return {'department': user_row.department_id, 'team': user_row.team_id, 'user': user_row.id}[kind] == scope_id
+
+# التحقق من الصفوف وتحويلها إلى قواميس جاهزة للإدراج
+def validate_rows(df, users, scope=None):
+    rows, errors = [], []
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        return rows, [(None, f"أعمدة ناقصة: {', '.join(missing)}")]
+
+    dates = pd.to_datetime(df['publication_date'], errors='coerce')
+    points = pd.to_numeric(df['points'], errors='coerce') if 'points' in df.columns else pd.Series(0, index=df.index)
+    for pos, (rec, pub, pts) in enumerate(zip(df.to_dict('records'), dates, points)):
+        line = pos + 2  # رقم السطر في الملف (بعد سطر العناوين)
+        user_row = users.get(str(rec['username']).strip())
+        if user_row is None:
+            errors.append((line, f"الباحث غير موجود: {rec['username']}"))
+            continue
+        if scope is not None and not _in_scope(scope, user_row):
+            errors.append((line, f"الباحث خارج صلاحياتك: {rec['username']}"))
+            continue
+        title = rec['title']
+        if pd.isna(title) or not str(title).strip():
+            errors.append((line, "العنوان فارغ"))
+            continue
+        if pd.isna(rec['activity_type']):
+            errors.append((line, "نوع النشاط فارغ"))
+            continue
+        if pd.isna(pub):
+            errors.append((line, f"تاريخ غير صالح: {rec['publication_date']}"))
+            continue
+        if pd.isna(pts):
+            errors.append((line, f"نقاط غير صالحة: {rec.get('points')}"))
+            continue
+        try:
+            details = _details_value(rec.get('details'))
+        except ValueError:
+            errors.append((line, "تفاصيل JSON غير صالحة"))
+            continue
+        pub = pub.date()
+        title = str(title).strip()
+        rows.append((line, {
+            'user_id': user_row.id,
+            'title': title,
+            'details': details,
+            'search_text': work_search_text(title, details),
+            'activity_type': str(rec['activity_type']).strip(),
+            'classification': None if pd.isna(rec.get('classification')) else str(rec.get('classification')),
+            'publication_date': pub,
+            'year': pub.year,
+            'points': int(pts),
+        }))
+    return rows, errors
+
+def _summary_rows(rows):
+    return [(r['user_id'], r['year'], r['activity_type'], r['points']) for r in rows]
+
+# إدراج دفعة في معاملة واحدة (مع تحديث الملخص)، ومع فشلها إعادة المحاولة صفاً صفاً لتحديد الأخطاء
+def _insert_batch(s, batch, errors):
+    try:
+        s.bulk_insert_mappings(Work, [r for _, r in batch])
+        record_works(s, _summary_rows(r for _, r in batch))
+        s.commit()
+        return len(batch)
+    except Exception:
+        s.rollback()
+    inserted = 0
+    for line, row in batch:
+        try:
+            with s.begin_nested():
+                s.bulk_insert_mappings(Work, [row])
+                record_works(s, _summary_rows([row]))
+            inserted += 1
+        except Exception as e:
+            count_error("bulk_import_works", e)
+            errors.append((line, f"خطأ في قاعدة البيانات: {e.__class__.__name__}"))
+    s.commit()
+    return inserted
+
+# استيراد جماعي للأعمال على دفعات (كل دفعة معاملة واحدة)
+@timed("bulk_import_works")
+def bulk_import_works(df, batch_size=1000, scope=None):
+    s = SessionLocal()
+    try:
+        usernames = df['username'].dropna().astype(str).str.strip().unique().tolist() if 'username' in df.columns else []
+        users = {u.username: u for u in s.query(User.id, User.username, User.team_id, User.department_id).filter(User.username.in_(usernames))}
+        rows, errors = validate_rows(df, users, scope)
+
+        inserted = 0
+        for start in range(0, len(rows), batch_size):
+            inserted += _insert_batch(s, rows[start:start + batch_size], errors)
+
+        # إبطال نطاقات الباحثين المتأثرين فقط
+        affected = {r['user_id'] for _, r in rows}
+        scopes = set()
+        for u in users.values():
+            if u.id in affected:
+                scopes.update(work_scopes(u.id, u.team_id, u.department_id))
+        if scopes:
+            invalidate_scopes(scopes)
+        return {'inserted': inserted, 'errors': sorted(errors, key=lambda e: e[0] or 0)}
+    finally:
+        s.close()
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m app.importer <works.xlsx|works.csv> [batch_size]")
+    result = bulk_import_works(read_works_file(sys.argv[1]), batch_size=int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+    for line, message in result['errors']:
+        print(f"line {line}: {message}" if line else message)
+    print(f"inserted {result['inserted']} works, {len(result['errors'])} errors")
+    sys.exit(1 if result['errors'] else 0)
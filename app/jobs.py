@@ -0,0 +1,103 @@
+from app.cache import ScopedCache, data_version
+from app.metrics import registry, count_error
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+# الحد الأقصى لمهام التصدير المتزامنة (حتى لا تستهلك موارد المستخدمين التفاعليين)
+JOB_WORKERS = int(os.environ.get("EXPORT_JOB_WORKERS", 2))
+# مدة الاحتفاظ بسجل المهام المنتهية
+JOB_RETENTION = int(os.environ.get("EXPORT_JOB_RETENTION", 3600))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="export-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# الملفات الجاهزة حسب بصمة المحتوى (النطاق + المعاملات + إصدار البيانات)
+artifact_cache = ScopedCache(
+    "artifacts",
+    ttl=int(os.environ.get("EXPORT_CACHE_TTL", 900)),
+    max_bytes=int(os.environ.get("EXPORT_CACHE_MAX_MB", 128)) * 1024 * 1024,
+)
+
+# مهمة تصدير في الخلفية (الحالة: queued / running / done / failed)
+class Job:
+    def __init__(self, kind, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = 'queued'
+        self.progress = 0.0
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def report(self, done, total):
+        self.progress = done / total if total else 1.0
+
+# بصمة محتوى الملف: نوعه + النطاق + المعاملات + إصدار بيانات النطاق
+def content_key(kind, scope, **params):
+    raw = repr((kind, scope, sorted(params.items()), data_version(scope)))
+    return (scope, hashlib.sha1(raw.encode()).hexdigest())
+
+def _run(job, fn, args, kwargs):
+    job.status = 'running'
+    t0 = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        if result is None:
+            raise RuntimeError("empty export")
+        artifact_cache.set(job.key, result)
+        job.status = 'done'
+    except Exception as e:
+        count_error(f"job.{job.kind}", e)
+        job.error = str(e)
+        job.status = 'failed'
+    finally:
+        registry.observe('job_seconds', time.perf_counter() - t0, kind=job.kind, status=job.status)
+        job.progress = 1.0
+        job.finished_at = time.time()
+
+def _prune():
+    limit = time.time() - JOB_RETENTION
+    for job_id, job in list(_jobs.items()):
+        if job.finished_at and job.finished_at < limit:
+            _jobs.pop(job_id, None)
+
+# إرسال مهمة تصدير؛ يُعاد استخدام الملف الجاهز أو المهمة الجارية لنفس البصمة
+# with_progress: تمرير دالة progress(done, total) إلى fn
+def submit_job(kind, scope, fn, *args, key_params=None, with_progress=False, **kwargs):
+    key = content_key(kind, scope, **(key_params or {}))
+    with _jobs_lock:
+        _prune()
+        for job in _jobs.values():
+            if job.key == key and job.status in ('queued', 'running'):
+                return job
+        job = Job(kind, key)
+        _jobs[job.id] = job
+        if artifact_cache.get(key) is not None:
+            job.status, job.progress, job.finished_at = 'done', 1.0, time.time()
+            return job
+    if with_progress:
+        kwargs['progress'] = job.report
+    _executor.submit(_run, job, fn, args, kwargs)
+    return job
+
+def get_job(job_id):
+    return _jobs.get(job_id) if job_id else None
+
+# محتوى الملف الجاهز (None إذا لم يكتمل أو انتهت صلاحيته)
+def job_result(job):
+    if job is None or job.status != 'done':
+        return None
+    return artifact_cache.get(job.key)
+
+# عدد المهام حسب الحالة
+def jobs_stats():
+    stats = {}
+    for job in list(_jobs.values()):
+        stats[job.status] = stats.get(job.status, 0) + 1
+    return stats
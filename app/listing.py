@@ -0,0 +1,94 @@
+from app.database import get_engine
+from app.services import build_scoped_query, dashboard_filter_conditions, summary_filter_conditions, scope_conditions, UNASSIGNED
+from app.metrics import timed, count_error
+from sqlalchemy import text
+import pandas as pd
+
+# أحجام الصفحات المعروضة، وسقف العد الدقيق عند تعذر استخدام جدول الملخص
+PAGE_SIZES = (25, 50, 100)
+COUNT_CAP = 10_000
+
+# أعمدة قائمة الأعمال فقط (بدون التفاصيل)
+LISTING_QUERY = f"""
+SELECT w.id, w.title, COALESCE(w.activity_type, '{UNASSIGNED}') AS activity_type, w.publication_date, w.points,
+    u.full_name AS researcher, COALESCE(t.name, '{UNASSIGNED}') AS team
+FROM works w
+JOIN users u ON w.user_id = u.id
+LEFT JOIN teams t ON u.team_id = t.id
+"""
+
+# كل خدمات الكتابة تشترط التاريخ؛ الصفوف القديمة دون تاريخ لا تدخل في الترقيم ولا في العدد
+DATED_CONDITION = "w.publication_date IS NOT NULL"
+# المقابل في جدول الملخص: السنة مشتقة من التاريخ، والسنة 0 تجمع الأعمال دون تاريخ
+SUMMARY_DATED_CONDITION = "w.year <> 0"
+
+# شرط الصفحة التالية بعد آخر صف معروض: مقارنة (التاريخ، المعرف) كقيمة صفية تستعمل فهرس ix_works_date_id
+def _after_condition(cursor, descending):
+    op = "<" if descending else ">"
+    return f"(w.publication_date, w.id) {op} (:after_date, :after_id)", {'after_date': cursor[0], 'after_id': cursor[1]}
+
+# صفحة واحدة من أعمال النطاق مرتبة حسب (publication_date, id) بترقيم keyset
+# cursor: (التاريخ، المعرف) لآخر صف في الصفحة السابقة أو None للصفحة الأولى
+# تُرجع (إطار الصفحة، مؤشر الصفحة التالية أو None)
+@timed("list_works")
+def list_works(scope, cursor=None, page_size=50, descending=True, **filters):
+    conds, params = dashboard_filter_conditions(**filters)
+    conds.append(DATED_CONDITION)
+    if cursor is not None:
+        cond, bound = _after_condition(cursor, descending)
+        conds.append(cond)
+        params.update(bound)
+    q, params = build_scoped_query(scope, base_q=LISTING_QUERY, conditions=conds, params=params)
+    direction = "DESC" if descending else "ASC"
+    # صف إضافي واحد لمعرفة وجود صفحة تالية دون عدّ
+    q = text(f"{q.text} ORDER BY w.publication_date {direction}, w.id {direction} LIMIT :limit")
+    params['limit'] = page_size + 1
+    try:
+        df = pd.read_sql(q, get_engine(), params=params)
+    except Exception as e:
+        count_error("list_works", e)
+        return pd.DataFrame(), None
+    has_more = len(df) > page_size
+    df = df.head(page_size).copy()
+    df['publication_date'] = pd.to_datetime(df['publication_date']).dt.date
+    next_cursor = (df['publication_date'].iloc[-1], int(df['id'].iloc[-1])) if has_more else None
+    return df, next_cursor
+
+# عدد تقريبي خفيف للأعمال: من جدول الملخص متى أمكن، وإلا عدّ محدود بسقف COUNT_CAP
+# تُرجع (العدد، هل هو دقيق)
+@timed("estimate_works_count")
+def estimate_works_count(scope, **filters):
+    conds, params = scope_conditions(scope)
+    summary = summary_filter_conditions(**filters)
+    try:
+        with get_engine().connect() as conn:
+            if summary is not None:
+                conds += summary[0] + [SUMMARY_DATED_CONDITION]
+                params.update(summary[1])
+                where = " WHERE " + " AND ".join(conds) if conds else ""
+                q = "SELECT COALESCE(SUM(w.works_count), 0) FROM work_summary w JOIN users u ON w.user_id = u.id" + where
+                return int(conn.execute(text(q), params).scalar()), True
+            f_conds, f_params = dashboard_filter_conditions(**filters)
+            conds += f_conds + [DATED_CONDITION]
+            params.update(f_params)
+            where = " WHERE " + " AND ".join(conds) if conds else ""
+            q = f"SELECT COUNT(*) FROM (SELECT 1 FROM works w JOIN users u ON w.user_id = u.id{where} LIMIT {COUNT_CAP + 1}) c"
+            n = int(conn.execute(text(q), params).scalar())
+            return min(n, COUNT_CAP), n <= COUNT_CAP
+    except Exception as e:
+        count_error("estimate_works_count", e)
+        return None, False
+
+# السنوات والأنواع المتاحة في النطاق (من جدول الملخص) لخيارات المرشحات
+def listing_options(scope):
+    conds, params = scope_conditions(scope)
+    where = " WHERE " + " AND ".join(conds) if conds else ""
+    base = f"FROM work_summary w JOIN users u ON w.user_id = u.id{where}"
+    try:
+        with get_engine().connect() as conn:
+            years = [r[0] for r in conn.execute(text(f"SELECT DISTINCT w.year {base} ORDER BY w.year DESC"), params) if r[0]]
+            types = [r[0] for r in conn.execute(text(f"SELECT DISTINCT w.activity_type {base} ORDER BY w.activity_type"), params)]
+        return years, types
+    except Exception as e:
+        count_error("listing_options", e)
+        return [], []
@@ -1,100 +1,228 @@
-import sys
 import os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'app')))
-print(sys.path)
+import sys
+# جذر المستودع في مسار الاستيراد (مرة واحدة لكل عملية) حتى تعمل "from app..." مع streamlit run app/main.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
 import streamlit as st
-from app.auth import auth_user, register_user_secure
-from app.services import get_smart_data, add_work_service, update_work_service, delete_work_service
-from app.pdf_utils import generate_cv_pdf
-from app.database import SessionLocal
+from datetime import date
+# صفحة الدخول تحتاج المصادقة والهيكل التنظيمي فقط؛ الوحدات الثقيلة (pandas وplotly وحزمة PDF)
+# تُستورد عند أول فتح للصفحة أو الإجراء الذي يحتاجها
+from app.auth import auth_user, register_user_secure, get_current_user, is_login_throttled, ACTIVATION_CODES
+from app.jobs import submit_job, get_job, job_result, content_key
+from app.database import get_engine
+from app.models import MEMBER_TYPES
+from app.metrics import page_render
+from app.org import get_org_tree
 from app.utils import get_img_as_base64
 
 # إعدادات الصفحة
 st.set_page_config(page_title="URSH - بوابة البحث العلمي", layout="wide", initial_sidebar_state="expanded", page_icon="🎓")
 
+# التحقق من إعداد الاتصال بقاعدة البيانات وتطبيق ترحيلات المخطط المعلقة (مرة واحدة لكل عملية)
+try:
+    from app.migrations import ensure_schema
+    ensure_schema(get_engine())
+except Exception as e:
+    st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {e}")
+    st.stop()
+
+# عرض حالة مهمة تصدير في الخلفية مع تحديث دوري حتى اكتمالها
+@st.fragment(run_every="2s")
+def show_export_job(state_key, key, label, filename, mime):
+    entry = st.session_state.get(state_key)
+    if not entry or entry[0] != key:
+        return
+    job = get_job(entry[1])
+    if job is None:
+        return
+    if job.status == 'done':
+        data = job_result(job)
+        if data:
+            st.download_button(label, data, filename, mime)
+        else:
+            st.info("انتهت صلاحية الملف، أعد التجهيز.")
+    elif job.status == 'failed':
+        st.error("تعذر إنشاء الملف.")
+    else:
+        st.progress(job.progress, text="⏳ جارٍ التجهيز في الخلفية...")
+
+# قائمة أعمال مرقمة صفحة بصفحة (keyset) مع مرشحات وترتيب من الخادم
+# حالة الصفحة: مكدس مؤشرات الصفحات المعروضة، يُصفّر عند تغيير المرشحات
+def show_works_listing(state_key, scope, show_researcher=True):
+    from app.listing import list_works, estimate_works_count, listing_options, PAGE_SIZES
+
+    years, types = listing_options(scope)
+    c1, c2, c3, c4 = st.columns(4)
+    sel_year = c1.selectbox("السنة", ["الكل"] + years, key=f"{state_key}_year")
+    sel_type = c2.selectbox("نوع النشاط", ["الكل"] + types, key=f"{state_key}_type")
+    newest_first = c3.selectbox("الترتيب", [True, False], format_func=lambda d: "الأحدث أولاً" if d else "الأقدم أولاً", key=f"{state_key}_order")
+    page_size = c4.selectbox("عدد الأعمال في الصفحة", PAGE_SIZES, index=1, key=f"{state_key}_size")
+    filters = dict(year=None if sel_year == "الكل" else sel_year, atype=None if sel_type == "الكل" else sel_type)
+
+    view = (tuple(sorted(filters.items())), newest_first, page_size)
+    state = st.session_state.get(state_key)
+    if state is None or state['view'] != view:
+        state = st.session_state[state_key] = {'view': view, 'cursors': [None]}
+
+    df, next_cursor = list_works(scope, state['cursors'][-1], page_size, newest_first, **filters)
+    total, exact = estimate_works_count(scope, **filters)
+    if total is not None:
+        st.caption(f"عدد الأعمال: {total}" if exact else f"عدد الأعمال: أكثر من {total}")
+    if df.empty:
+        st.info("لا توجد أعمال مطابقة.")
+        return
+
+    columns = {'title': "العنوان", 'activity_type': "النوع", 'publication_date': "التاريخ", 'points': "النقاط", 'researcher': "الباحث", 'team': "الفرقة"}
+    if not show_researcher:
+        columns.pop('researcher')
+        columns.pop('team')
+    st.dataframe(df[list(columns)].rename(columns=columns), use_container_width=True, hide_index=True)
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    p2.markdown(f"<div style='text-align:center;'>صفحة {len(state['cursors'])}</div>", unsafe_allow_html=True)
+    if p3.button("السابق ◀", disabled=len(state['cursors']) == 1, key=f"{state_key}_prev"):
+        state['cursors'].pop()
+        st.rerun()
+    if p1.button("▶ التالي", disabled=next_cursor is None, key=f"{state_key}_next"):
+        state['cursors'].append(next_cursor)
+        st.rerun()
+
+# بحث في أعمال النطاق والفرق، بنتائج مرتبة ومقسمة إلى صفحات
+def show_works_search(state_key, scope):
+    from app.search import search_works, search_teams
+
+    query = st.text_input("🔍 بحث في الأعمال والفرق", key=f"{state_key}_query", placeholder="عنوان، مجلة، ناشر، كلمة مفتاحية...")
+    if not query.strip():
+        return
+    state = st.session_state.get(state_key)
+    if state is None or state['query'] != query:
+        state = st.session_state[state_key] = {'query': query, 'page': 0}
+
+    teams = search_teams(query)
+    if teams:
+        st.caption("الفرق: " + "، ".join(t['name'] for t in teams))
+    df, has_more = search_works(scope, query, state['page'])
+    if df.empty:
+        st.info("لا توجد نتائج مطابقة.")
+        return
+    columns = {'title': "العنوان", 'activity_type': "النوع", 'publication_date': "التاريخ", 'researcher': "الباحث", 'team': "الفرقة"}
+    st.dataframe(df[list(columns)].rename(columns=columns), use_container_width=True, hide_index=True)
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    p2.markdown(f"<div style='text-align:center;'>صفحة {state['page'] + 1}</div>", unsafe_allow_html=True)
+    if p3.button("السابق ◀", disabled=state['page'] == 0, key=f"{state_key}_prev"):
+        state['page'] -= 1
+        st.rerun()
+    if p1.button("▶ التالي", disabled=not has_more, key=f"{state_key}_next"):
+        state['page'] += 1
+        st.rerun()
+
+# استيراد أعمال من ملف Excel/CSV داخل نطاق المستخدم (إدراج على دفعات)
+def show_works_import(scope):
+    from app.importer import IMPORT_COLUMNS, read_works_file, bulk_import_works
+
+    with st.expander("📤 استيراد أعمال من ملف"):
+        st.caption("الأعمدة: " + "، ".join(IMPORT_COLUMNS))
+        upload = st.file_uploader("ملف Excel أو CSV", type=["xlsx", "csv"], key="works_import_file")
+        if upload is None or not st.button("استيراد", type="primary", key="works_import_run"):
+            return
+        try:
+            df = read_works_file(upload, upload.name)
+        except Exception:
+            st.error("تعذر قراءة الملف.")
+            return
+        with st.spinner("⏳ جارٍ الاستيراد..."):
+            result = bulk_import_works(df, scope=scope)
+        st.success(f"✅ تم استيراد {result['inserted']} عملاً")
+        if result['errors']:
+            st.warning(f"⚠️ {len(result['errors'])} سطراً لم يُستورد")
+            st.dataframe([{'السطر': line, 'الخطأ': message} for line, message in result['errors']], use_container_width=True, hide_index=True)
+
 # --- الدخول والتسجيل ---
 if 'logged_in' not in st.session_state:
     st.session_state['logged_in'] = False
 
 if not st.session_state['logged_in']:
-    c1, c2, c3 = st.columns([1, 1.5, 1])
-    with c2:
-        st.markdown("<br><br>", unsafe_allow_html=True)
-        logo_path = "assets/logo.png"
-        logo_html = '<div style="font-size: 80px; margin-bottom: 10px; text-align:center;">🏛️</div>'
-        if os.path.exists(logo_path):
-            img = get_img_as_base64(logo_path)
-            if img: 
-                logo_html = f'<div style="display: flex; justify-content: center;"><img src="data:image/png;base64,{img}" style="width: 150px; margin-bottom: 20px;"></div>'
+    with page_render("login"):
+        c1, c2, c3 = st.columns([1, 1.5, 1])
+        with c2:
+            st.markdown("<br><br>", unsafe_allow_html=True)
+            logo_path = "assets/logo.png"
+            logo_html = '<div style="font-size: 80px; margin-bottom: 10px; text-align:center;">🏛️</div>'
+            if os.path.exists(logo_path):
+                img = get_img_as_base64(logo_path)
+                if img: 
+                    logo_html = f'<div style="display: flex; justify-content: center;"><img src="data:image/png;base64,{img}" style="width: 150px; margin-bottom: 20px;"></div>'
 
-        st.markdown(logo_html, unsafe_allow_html=True)
-        st.markdown("""<div style="display: flex; flex-direction: column; align-items: center; justify-content: center; text-align: center; width: 100%; margin-bottom: 30px;">
-                        <h1 style="color:#2563eb; font-family:'Cairo'; margin: 0; font-size: 2.5rem;">بوابة البحث العلمي</h1>
-                        <p style="opacity: 0.7; font-size: 1.1rem; margin-top: 5px;">نظام إدارة المخابر الجامعية الموحد</p>
-                      </div>""", unsafe_allow_html=True)
+            st.markdown(logo_html, unsafe_allow_html=True)
+            st.markdown("""<div style="display: flex; flex-direction: column; align-items: center; justify-content: center; text-align: center; width: 100%; margin-bottom: 30px;">
+                            <h1 style="color:#2563eb; font-family:'Cairo'; margin: 0; font-size: 2.5rem;">بوابة البحث العلمي</h1>
+                            <p style="opacity: 0.7; font-size: 1.1rem; margin-top: 5px;">نظام إدارة المخابر الجامعية الموحد</p>
+                          </div>""", unsafe_allow_html=True)
         
-        tab_login, tab_signup = st.tabs(["🔐 تسجيل الدخول", "📝 حساب جديد (بالكود)"])
+            tab_login, tab_signup = st.tabs(["🔐 تسجيل الدخول", "📝 حساب جديد (بالكود)"])
         
-        with tab_login:
-            with st.form("login"):
-                u = st.text_input("اسم المستخدم")
-                p = st.text_input("كلمة المرور", type="password")
-                if st.form_submit_button("دخول", type="primary", use_container_width=True):
-                    user = auth_user(u, p)
-                    if user:
-                        st.session_state['logged_in'] = True
-                        st.session_state['user_id'] = user.id
-                        st.rerun()
-                    else: 
-                        st.error("بيانات خاطئة")
-
-        with tab_signup:
-            st.markdown("##### 🆕 إنشاء حساب باستخدام كود التفعيل")
-            c_a, c_b = st.columns(2)
-            new_name = c_a.text_input("الاسم الكامل")
-            new_user = c_b.text_input("اسم المستخدم (للدخول)")
-            c_pass, c_role = st.columns(2)
-            new_pass = c_pass.text_input("كلمة المرور", type="password")
-            role_key = c_role.selectbox("الصفة", list(ACTIVATION_CODES.keys()))
+            with tab_login:
+                with st.form("login"):
+                    u = st.text_input("اسم المستخدم")
+                    p = st.text_input("كلمة المرور", type="password")
+                    if st.form_submit_button("دخول", type="primary", use_container_width=True):
+                        ip = getattr(st.context, 'ip_address', None)
+                        if is_login_throttled(u, ip):
+                            st.error("⛔ محاولات كثيرة، يرجى المحاولة لاحقاً")
+                        else:
+                            uid = auth_user(u, p, ip)
+                            if uid:
+                                st.session_state['logged_in'] = True
+                                st.session_state['user_id'] = uid
+                                st.rerun()
+                            else: 
+                                st.error("بيانات خاطئة")
+
+            with tab_signup:
+                st.markdown("##### 🆕 إنشاء حساب باستخدام كود التفعيل")
+                c_a, c_b = st.columns(2)
+                new_name = c_a.text_input("الاسم الكامل")
+                new_user = c_b.text_input("اسم المستخدم (للدخول)")
+                c_pass, c_role = st.columns(2)
+                new_pass = c_pass.text_input("كلمة المرور", type="password")
+                role_key = c_role.selectbox("الصفة", list(ACTIVATION_CODES.keys()))
             
-            m_type_key = "permanent"
-            if role_key in ['leader', 'researcher']:
-                m_type_key = st.selectbox("نوع العضوية", list(MEMBER_TYPES.keys()), format_func=lambda x: MEMBER_TYPES[x])
+                m_type_key = "permanent"
+                if role_key in ['leader', 'researcher']:
+                    m_type_key = st.selectbox("نوع العضوية", list(MEMBER_TYPES.keys()), format_func=lambda x: MEMBER_TYPES[x])
             
-            session = SessionLocal()
-            depts = session.query(Department).all()
-            d_map = {d.name_ar: d.id for d in depts}
-            sel_dept_id = None
-            sel_team_id = None
+                org = get_org_tree()
+                sel_dept_id = None
+                sel_team_id = None
             
-            if role_key != 'admin':
-                d_name = st.selectbox("القسم", list(d_map.keys()))
-                sel_dept_id = d_map[d_name]
-                if role_key in ['leader', 'researcher']:
-                    teams = session.query(Team).filter_by(department_id=sel_dept_id).all()
-                    if teams:
-                        t_map = {t.name: t.id for t in teams}
-                        t_name = st.selectbox("الفرقة", list(t_map.keys()))
-                        sel_team_id = t_map[t_name]
-                    else: st.warning("⚠️ لا توجد فرق.")
-            session.close()
-
-            act_code = st.text_input("🔑 كود التفعيل", type="password")
+                if role_key != 'admin':
+                    sel_dept_id = st.selectbox("القسم", org.departments(), format_func=lambda d_id: org.department_names[d_id])
+                    if role_key in ['leader', 'researcher']:
+                        team_ids = org.teams_of(sel_dept_id)
+                        if team_ids:
+                            sel_team_id = st.selectbox("الفرقة", team_ids, format_func=lambda t_id: org.team_names[t_id])
+                        else: st.warning("⚠️ لا توجد فرق.")
+
+                act_code = st.text_input("🔑 كود التفعيل", type="password")
             
-            if st.button("إنشاء الحساب", type="primary", use_container_width=True):
-                if new_user and new_pass and act_code:
-                    success, msg = register_user_secure(new_user, new_name, new_pass, role_key, act_code, sel_team_id, sel_dept_id, m_type_key)
-                    if success: 
-                        st.success(msg)
+                if st.button("إنشاء الحساب", type="primary", use_container_width=True):
+                    if new_user and new_pass and act_code:
+                        success, msg = register_user_secure(new_user, new_name, new_pass, role_key, act_code, sel_team_id, sel_dept_id, m_type_key)
+                        if success: 
+                            st.success(msg)
+                        else: 
+                            st.error(msg)
                     else: 
-                        st.error(msg)
-                else: 
-                    st.warning("جميع الحقول مطلوبة")
+                        st.warning("جميع الحقول مطلوبة")
 
 # --- النظام الداخلي ---
 else:
-    session = SessionLocal()
-    user = session.query(User).filter(User.id == st.session_state['user_id']).first()
+    user = get_current_user(st.session_state)
+    if user is None:
+        st.session_state['logged_in'] = False
+        st.rerun()
     
     with st.sidebar:
         logo_path = "assets/logo.png"
@@ -136,104 +264,152 @@ else:
         st.markdown("---")
         if st.button("تسجيل الخروج", type="secondary"):
             st.session_state['logged_in'] = False
+            st.session_state.pop('current_user', None)
             st.rerun()
 
     # --- لوحة القيادة ---
     if selection == "لوحة القيادة":
-        st.markdown(f"## 📊 لوحة القيادة والتحليل البياني")
-        df = get_smart_data(user)
-        if not df.empty:
-            with st.expander("🔍 تصفية البيانات", expanded=True):
-                col_d1, col_d2 = st.columns(2)
-                min_date = df['publication_date'].min()
-                max_date = df['publication_date'].max()
-                d_from = col_d1.date_input("من تاريخ", min_date)
-                d_to = col_d2.date_input("إلى تاريخ", max_date)
+        with page_render(selection):
+            from app.services import get_user_scope, dashboard_aggregates, UNASSIGNED
+            from app.filters import get_filter_engine
+            from app.charts import dashboard_figures
+            st.markdown(f"## 📊 لوحة القيادة والتحليل البياني")
+            fe = get_filter_engine(user)
+            if fe is not None:
+                with st.expander("🔍 تصفية البيانات", expanded=True):
+                    col_d1, col_d2 = st.columns(2)
+                    min_date, max_date = fe.date_bounds()
+                    d_from = col_d1.date_input("من تاريخ", min_date)
+                    d_to = col_d2.date_input("إلى تاريخ", max_date)
                 
-                available_years = sorted(df['year'].unique().tolist(), reverse=True)
-                selected_year = st.selectbox("أو اختر سنة محددة (تتجاوز التاريخ)", ["الكل"] + available_years)
-
-                c1, c2, c3 = st.columns(3)
-                depts = sorted(df['department'].unique().tolist())
-                sel_dept = c1.selectbox("القسم", ["الكل"] + depts)
-                if sel_dept != "الكل":
-                    teams = sorted(df[df['department'] == sel_dept]['team'].unique().tolist())
-                else:
-                    teams = sorted(df['team'].unique().tolist())
-                sel_team = c2.selectbox("الفرقة", ["الكل"] + teams)
-                types = sorted(df['activity_type'].unique().tolist())
-                sel_type = c3.selectbox("نوع النشاط", ["الكل"] + types)
-
-            if selected_year != "الكل":
-                filtered = df[df['year'] == selected_year]
-            else:
-                filtered = df[(df['publication_date'] >= d_from) & (df['publication_date'] <= d_to)]
-            
-            if sel_dept != "الكل": 
-                filtered = filtered[filtered['department'] == sel_dept]
-            if sel_team != "الكل": 
-                filtered = filtered[filtered['team'] == sel_team]
-            if sel_type != "الكل": 
-                filtered = filtered[filtered['activity_type'] == sel_type]
-
-            excel_data = to_excel(filtered)
-            if excel_data: 
-                st.download_button("📥 تحميل التقرير (Excel)", excel_data, f"report_{date.today()}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-
-            st.markdown("<br>", unsafe_allow_html=True)
-            k1, k2, k3, k4 = st.columns(4)
-            with k4: 
-                st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{len(filtered)}</div><div class="kpi-label">إجمالي النتاج</div></div><div class="kpi-icon">📚</div></div>', unsafe_allow_html=True)
-            with k3: 
-                st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{filtered["researcher"].nunique()}</div><div class="kpi-label">الباحثون</div></div><div class="kpi-icon">👥</div></div>', unsafe_allow_html=True)
-            with k2: 
-                st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{filtered["points"].sum()}</div><div class="kpi-label">النقاط</div></div><div class="kpi-icon">⭐</div></div>', unsafe_allow_html=True)
-            with k1: 
-                yr = filtered['year'].mode()[0] if not filtered.empty else "-"
-                st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{yr}</div><div class="kpi-label">السنة النشطة</div></div><div class="kpi-icon">📅</div></div>', unsafe_allow_html=True)
-
-            st.markdown("---")
-            st.markdown("### 🏆 مؤشرات الأداء والتميز")
+                    available_years = sorted(fe.options('year'), reverse=True)
+                    selected_year = st.selectbox("أو اختر سنة محددة (تتجاوز التاريخ)", ["الكل"] + available_years)
+                    # حدود التاريخ الافتراضية لا تقيد شيئاً (فتُقرأ المؤشرات من جدول الملخص)
+                    filters = dict(
+                        date_from=d_from if selected_year == "الكل" and d_from != min_date else None,
+                        date_to=d_to if selected_year == "الكل" and d_to != max_date else None,
+                        year=selected_year if selected_year != "الكل" else None,
+                    )
+
+                    # خيارات القسم والفرقة من الهيكل التنظيمي المشترك (بالمعرفات) حسب نطاق المستخدم
+                    org = get_org_tree()
+                    scope = get_user_scope(user)
+                    if scope[0] == 'admin':
+                        dept_options = org.departments() + [UNASSIGNED]
+                    else:
+                        dept_options = [user.department_id] if user.department_id else []
+                    def structure_label(names):
+                        return lambda v: v if v in ("الكل", UNASSIGNED) else names.get(v, UNASSIGNED)
+
+                    c1, c2, c3 = st.columns(3)
+                    sel_dept = c1.selectbox("القسم", ["الكل"] + dept_options, format_func=structure_label(org.department_names))
+                    filters['dept'] = None if sel_dept == "الكل" else sel_dept
+                    if scope[0] in ('team', 'user'):
+                        team_options = [user.team_id] if user.team_id else []
+                    elif sel_dept not in ("الكل", UNASSIGNED):
+                        team_options = org.teams_of(sel_dept)
+                    elif scope[0] == 'department':
+                        team_options = org.teams_of(user.department_id)
+                    else:
+                        team_options = org.teams_of() + [UNASSIGNED]
+                    sel_team = c2.selectbox("الفرقة", ["الكل"] + team_options, format_func=structure_label(org.team_names))
+                    filters['team'] = None if sel_team == "الكل" else sel_team
+                    # أنواع النشاط المتاحة فقط ضمن المرشحات السابقة (تقاطع فهارس دون مسح البيانات)
+                    types = sorted(fe.options('atype', **filters))
+                    sel_type = c3.selectbox("نوع النشاط", ["الكل"] + types)
+                    filters['atype'] = None if sel_type == "الكل" else sel_type
+
+                matched = fe.count(**filters)
+                st.caption(f"عدد الأعمال المطابقة: {matched}")
+
+                # التقرير يُبنى في الخلفية عند الطلب فقط ويُعاد استخدامه لنفس المرشحات والبيانات
+                report_key = content_key('excel', scope, **filters)
+                if st.button("📄 تجهيز التقرير (Excel)"):
+                    from app.export import export_works_excel
+                    job = submit_job('excel', scope, export_works_excel, scope, key_params=filters, **filters)
+                    st.session_state['excel_job'] = (job.key, job.id)
+                show_export_job('excel_job', report_key, "📥 تحميل التقرير (Excel)", f"report_{date.today()}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+                if not matched:
+                    st.info("لا توجد أعمال مطابقة للمرشحات المختارة.")
+                    st.stop()
+
+                aggs = dashboard_aggregates(scope, **filters)
+                if aggs is None:
+                    st.error("تعذر حساب المؤشرات.")
+                    st.stop()
+
+                st.markdown("<br>", unsafe_allow_html=True)
+                k1, k2, k3, k4 = st.columns(4)
+                with k4: 
+                    st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{aggs["total"]}</div><div class="kpi-label">إجمالي النتاج</div></div><div class="kpi-icon">📚</div></div>', unsafe_allow_html=True)
+                with k3: 
+                    st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{aggs["researchers"]}</div><div class="kpi-label">الباحثون</div></div><div class="kpi-icon">👥</div></div>', unsafe_allow_html=True)
+                with k2: 
+                    st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{aggs["points"]}</div><div class="kpi-label">النقاط</div></div><div class="kpi-icon">⭐</div></div>', unsafe_allow_html=True)
+                with k1: 
+                    yr = aggs['active_year'] if aggs['active_year'] is not None else "-"
+                    st.markdown(f'<div class="kpi-container"><div class="kpi-info"><div class="kpi-value">{yr}</div><div class="kpi-label">السنة النشطة</div></div><div class="kpi-icon">📅</div></div>', unsafe_allow_html=True)
+
+                st.markdown("---")
+                st.markdown("### 🏆 مؤشرات الأداء والتميز")
             
-            c1, c2 = st.columns(2)
-            with c1:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                top_res = filtered.groupby('researcher')['points'].sum().reset_index().sort_values('points', ascending=False).head(5)
-                fig_lead = px.bar(top_res, x='points', y='researcher', orientation='h', title="🥇 أكثر الباحثين تميزاً (حسب النقاط)", text_auto=True, color_discrete_sequence=['#fbbf24'])
-                st.plotly_chart(fig_lead, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
+                # المخططات تُبنى من جداول التجميع فقط وتُحفظ حسب (النطاق، المرشحات)
+                figs = dashboard_figures(scope, aggs, **filters)
+                c1, c2 = st.columns(2)
+                with c1:
+                    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+                    st.plotly_chart(figs['leaderboard'], use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
             
-            with c2:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                if not filtered.empty and 'department' in filtered.columns and 'team' in filtered.columns:
-                    tree_data = filtered.groupby(['department', 'team'])['points'].sum().reset_index()
-                    fig_tree = px.treemap(
-                        tree_data, 
-                        path=['department', 'team'], 
-                        values='points', 
-                        title="🧬 مساهمة الهياكل (خريطة شجرية)", 
-                        color='department',
-                        color_discrete_sequence=px.colors.qualitative.Prism
-                    )
-                    fig_tree.update_traces(textinfo="label+value+percent entry")
-                    st.plotly_chart(fig_tree, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-
-            c1, c2 = st.columns(2)
-            with c1:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                st.markdown("##### 📊 توزيع الأنشطة")
-                if not filtered.empty:
-                    fig = px.pie(filtered, names='activity_type', hole=0.5, color_discrete_sequence=px.colors.sequential.Blues_r)
-                    st.plotly_chart(fig, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-            with c2:
-                st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-                st.markdown("##### 📈 التطور السنوي")
-                if not filtered.empty:
-                    daily = filtered.groupby('year').size().reset_index(name='count')
-                    fig2 = px.bar(daily, x='year', y='count', text_auto=True, color_discrete_sequence=['#2563eb'])
-                    st.plotly_chart(fig2, use_container_width=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-        else: 
-            st.info("لا توجد بيانات متاحة لعرضها.")
+                with c2:
+                    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+                    if figs['structure'] is not None:
+                        st.plotly_chart(figs['structure'], use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                c1, c2 = st.columns(2)
+                with c1:
+                    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+                    st.markdown("##### 📊 توزيع الأنشطة")
+                    if figs['types'] is not None:
+                        st.plotly_chart(figs['types'], use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+                with c2:
+                    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+                    st.markdown("##### 📈 التطور السنوي")
+                    if figs['yearly'] is not None:
+                        st.plotly_chart(figs['yearly'], use_container_width=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+
+                # تصدير السير الذاتية لجميع أعضاء النطاق دفعة واحدة
+                if user.role in ['admin', 'dept_head', 'leader']:
+                    st.markdown("---")
+                    cvs_key = content_key('cvs', scope)
+                    if st.button("📦 تجهيز السير الذاتية للأعضاء (ZIP)"):
+                        from app.cv_batch import scope_cvs_zip
+                        job = submit_job('cvs', scope, scope_cvs_zip, scope, with_progress=True)
+                        st.session_state['cvs_job'] = (job.key, job.id)
+                    show_export_job('cvs_job', cvs_key, "📥 تحميل السير الذاتية", f"cvs_{date.today()}.zip", "application/zip")
+            else: 
+                st.info("لا توجد بيانات متاحة لعرضها.")
+
+    # --- إدارة الأنشطة ---
+    elif selection == "إدارة الأنشطة":
+        with page_render(selection):
+            from app.services import get_user_scope
+            st.markdown("## 🗂️ إدارة الأنشطة")
+            scope = get_user_scope(user)
+            if scope is None:
+                st.info("لا توجد بيانات متاحة لعرضها.")
+            else:
+                if user.role in ['admin', 'dept_head']:
+                    show_works_import(scope)
+                show_works_search('activities_search', scope)
+                show_works_listing('activities_listing', scope)
+
+    # --- سجل أعمالي ---
+    elif selection == "أعمالي":
+        with page_render(selection):
+            st.markdown("## 📂 سجل أعمالي")
+            show_works_listing('my_works_listing', ('user', user.id), show_researcher=False)
@@ -0,0 +1,208 @@
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("lab.metrics")
+
+# حدود فئات مدرجات الزمن بالثواني
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# الاستعلامات الأبطأ من هذا الحد تُسجل مع نص SQL
+SLOW_QUERY_SECONDS = float(os.environ.get("SLOW_QUERY_MS", 500)) / 1000
+# ملف لقطة المقاييس (بصيغة Prometheus النصية) والفاصل الأدنى بين كتابتين
+METRICS_FILE = os.environ.get("METRICS_FILE")
+METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", 30))
+
+# مدرج تكراري تراكمي (نفس دلالة histogram في Prometheus)
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    # أعداد تراكمية لكل حد (le) ثم +Inf
+    def cumulative(self):
+        total, out = 0, []
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            out.append((bound, total))
+        out.append(("+Inf", self.count))
+        return out
+
+# سجل المقاييس في العملية: مدرجات زمن وعدادات بأسماء وتسميات
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def observe(self, metric, value, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def incr(self, metric, amount=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': {k: (h.cumulative(), h.count, h.sum) for k, h in self._histograms.items()},
+                'counters': dict(self._counters),
+            }
+
+registry = MetricsRegistry()
+
+# قياس زمن دالة خدمة (كمزخرف أو كمدير سياق) في المدرج service_seconds
+class timed:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe('service_seconds', time.perf_counter() - self._t0, name=self.name)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+# تسجيل استثناء تم احتواؤه (بدلاً من ضياعه بصمت)
+def count_error(name, exc):
+    registry.incr('swallowed_errors_total', name=name, error=exc.__class__.__name__)
+    logger.warning("%s failed: %s", name, exc, exc_info=exc)
+
+# عدادات الاستعلامات والصفوف لإعادة التشغيل الحالية (لكل خيط جلسة Streamlit)
+_rerun = threading.local()
+
+def _rerun_stats():
+    stats = getattr(_rerun, 'stats', None)
+    if stats is None:
+        stats = _rerun.stats = {'queries': 0, 'rows': 0, 'db_seconds': 0.0}
+    return stats
+
+# ربط أحداث SQLAlchemy بالمحرك: عدد الاستعلامات وزمنها والصفوف وتسجيل البطيء منها
+# (عدد الصفوف حسب ما يبلّغ عنه المشغل؛ psycopg2 يبلّغ عن صفوف SELECT وSQLite لا يفعل)
+def instrument_engine(eng):
+    from sqlalchemy import event
+
+    @event.listens_for(eng, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        registry.observe('query_seconds', elapsed)
+        registry.incr('queries_total')
+        registry.incr('query_rows_total', rows)
+        stats = _rerun_stats()
+        stats['queries'] += 1
+        stats['rows'] += rows
+        stats['db_seconds'] += elapsed
+        if elapsed >= SLOW_QUERY_SECONDS:
+            registry.incr('slow_queries_total')
+            logger.warning("slow query (%.0f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+    @event.listens_for(eng, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get('query_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+        registry.incr('query_errors_total')
+
+    return eng
+
+# زمن عرض صفحة في main.py مع عدد استعلاماتها وصفوفها في إعادة التشغيل نفسها
+@contextmanager
+def page_render(page):
+    _rerun.stats = {'queries': 0, 'rows': 0, 'db_seconds': 0.0}
+    t0 = time.perf_counter()
+    try:
+        yield _rerun.stats
+    finally:
+        stats = _rerun.stats
+        registry.observe('page_render_seconds', time.perf_counter() - t0, page=page)
+        registry.observe('page_db_seconds', stats['db_seconds'], page=page)
+        registry.incr('page_renders_total', page=page)
+        registry.incr('page_queries_total', stats['queries'], page=page)
+        registry.incr('page_rows_total', stats['rows'], page=page)
+        maybe_dump_metrics()
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+# لقطة المقاييس بصيغة Prometheus النصية (مع الذاكرات المؤقتة وتجمع الاتصالات)
+def prometheus_text():
+    from app.cache import cache_stats
+    from app.database import pool_status
+
+    snap = registry.snapshot()
+    lines = []
+    for (metric, labels), value in sorted(snap['counters'].items()):
+        lines.append(f"lab_{metric}{_labels(labels)} {value}")
+    for (metric, labels), (buckets, count, total) in sorted(snap['histograms'].items()):
+        for bound, n in buckets:
+            lines.append(f"lab_{metric}_bucket{_labels(labels + (('le', bound),))} {n}")
+        lines.append(f"lab_{metric}_count{_labels(labels)} {count}")
+        lines.append(f"lab_{metric}_sum{_labels(labels)} {total:.6f}")
+    for name, stats in cache_stats().items():
+        for field in ('hits', 'misses', 'evictions', 'entries', 'bytes'):
+            if field in stats:
+                lines.append(f'lab_cache_{field}{{cache="{name}"}} {stats[field]}')
+    for field, value in pool_status().items():
+        lines.append(f"lab_pool_{field} {value}")
+    return "\n".join(lines) + "\n"
+
+# كتابة اللقطة إلى ملف (كتابة ذرية عبر ملف مؤقت)
+def dump_metrics(path=None):
+    path = path or METRICS_FILE
+    if not path:
+        return None
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+    return path
+
+_last_dump = 0.0
+
+# كتابة دورية للقطة عند ضبط METRICS_FILE فقط
+def maybe_dump_metrics():
+    global _last_dump
+    if not METRICS_FILE or time.monotonic() - _last_dump < METRICS_DUMP_INTERVAL:
+        return
+    _last_dump = time.monotonic()
+    try:
+        dump_metrics()
+    except OSError as e:
+        count_error('dump_metrics', e)
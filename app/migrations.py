@@ -0,0 +1,262 @@
+from datetime import datetime
+import threading
+from sqlalchemy import inspect, text
+from app.models import Base, DETAIL_KEYS, WorkSummary, detail_sql
+from app.summary import refill_summary
+from app.utils import work_search_text
+import json
+
+# إصلاح نصوص details غير الصالحة قبل تحويل العمود إلى JSON
+def _normalize_details(conn):
+    fixes = []
+    for wid, raw in conn.execute(text("SELECT id, details FROM works WHERE details IS NOT NULL")):
+        if not isinstance(raw, str):
+            continue
+        if not raw.strip():
+            fixes.append({'id': wid, 'd': None})
+            continue
+        try:
+            json.loads(raw)
+        except ValueError:
+            fixes.append({'id': wid, 'd': json.dumps({'ملاحظات': raw}, ensure_ascii=False)})
+    if fixes:
+        conn.execute(text("UPDATE works SET details = :d WHERE id = :id"), fixes)
+
+# تحويل details إلى JSONB (PostgreSQL) مع فهارس GIN وفهارس تعبيرية للمفاتيح الشائعة
+def _details_to_json(conn):
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(text("ALTER TABLE works ALTER COLUMN details TYPE JSONB USING details::jsonb"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_works_details_gin ON works USING GIN (details jsonb_path_ops)"))
+    for name, key in DETAIL_KEYS.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_works_details_{name} ON works (({detail_sql(dialect, key, 'details')}))"))
+
+def _details_to_text(conn):
+    for name in DETAIL_KEYS:
+        conn.execute(text(f"DROP INDEX IF EXISTS ix_works_details_{name}"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("DROP INDEX IF EXISTS ix_works_details_gin"))
+        conn.execute(text("ALTER TABLE works ALTER COLUMN details TYPE TEXT USING details::text"))
+
+# إعادة كتابة التفاصيل المخزنة سابقاً: NULL بدل 'null'، والمفاتيح العربية دون \\uXXXX (SQLite)
+def _rewrite_details(conn, batch_size=2000):
+    if conn.dialect.name == "postgresql":
+        # JSONB يخزن القيم محللة فلا تبقى فيه رموز الهروب
+        conn.execute(text("UPDATE works SET details = NULL WHERE jsonb_typeof(details) = 'null'"))
+        return
+    conn.execute(text("UPDATE works SET details = NULL WHERE details = 'null'"))
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, details FROM works WHERE id > :last AND details IS NOT NULL ORDER BY id LIMIT :n"),
+            {'last': last_id, 'n': batch_size},
+        ).fetchall()
+        if not rows:
+            return
+        fixes = [{'id': r.id, 'd': json.dumps(json.loads(r.details), ensure_ascii=False)}
+                 for r in rows if '\\u' in r.details]
+        if fixes:
+            conn.execute(text("UPDATE works SET details = :d WHERE id = :id"), fixes)
+        last_id = rows[-1].id
+
+# إنشاء جدول الملخص وتعبئته من الأعمال الحالية
+def _create_summary(conn):
+    WorkSummary.__table__.create(conn, checkfirst=True)
+    refill_summary(conn)
+
+def _drop_summary(conn):
+    WorkSummary.__table__.drop(conn, checkfirst=True)
+
+# قوادح مزامنة جدول FTS5 مع works (محتوى خارجي: النص لا يُخزن مرتين)
+FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS works_fts_ai AFTER INSERT ON works BEGIN
+        INSERT INTO works_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS works_fts_ad AFTER DELETE ON works BEGIN
+        INSERT INTO works_fts(works_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS works_fts_au AFTER UPDATE OF search_text ON works BEGIN
+        INSERT INTO works_fts(works_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO works_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+]
+
+# تعبئة search_text للأعمال الحالية على دفعات
+def _backfill_search_text(conn, batch_size=2000):
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, title, details FROM works WHERE id > :last ORDER BY id LIMIT :n"),
+            {'last': last_id, 'n': batch_size},
+        ).fetchall()
+        if not rows:
+            return
+        conn.execute(
+            text("UPDATE works SET search_text = :s WHERE id = :id"),
+            [{'id': r.id, 's': work_search_text(r.title, r.details)} for r in rows],
+        )
+        last_id = rows[-1].id
+
+# إضافة عمود البحث وتعبئته وفهارسه
+def _create_search_index(conn):
+    dialect = conn.dialect.name
+    if 'search_text' not in {c['name'] for c in inspect(conn).get_columns('works')}:
+        conn.execute(text("ALTER TABLE works ADD COLUMN search_text TEXT"))
+    _backfill_search_text(conn)
+    if dialect == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_works_search_tsv ON works USING GIN (to_tsvector('simple', search_text))"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_works_search_trgm ON works USING GIN (search_text gin_trgm_ops)"))
+    elif dialect == "sqlite" and _fts5_available(conn):
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5("
+            "search_text, content='works', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+        for trigger in FTS_TRIGGERS:
+            conn.execute(text(trigger))
+        conn.execute(text("INSERT INTO works_fts(works_fts) VALUES ('rebuild')"))
+
+def _drop_search_index(conn):
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(text("DROP INDEX IF EXISTS ix_works_search_tsv"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_works_search_trgm"))
+    elif dialect == "sqlite":
+        for name in ('works_fts_ai', 'works_fts_ad', 'works_fts_au'):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(text("DROP TABLE IF EXISTS works_fts"))
+    conn.execute(text("ALTER TABLE works DROP COLUMN search_text"))
+
+def _fts5_available(conn):
+    try:
+        return bool(conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+    except Exception:
+        return False
+
+# الترحيلات المرقمة: (الإصدار، الوصف، أوامر الترقية، أوامر التراجع)
+MIGRATIONS = [
+    (1, "فهارس الأعمدة المستخدمة في استعلامات لوحة القيادة والتسجيل", [
+        "CREATE INDEX IF NOT EXISTS ix_works_user_year ON works (user_id, year)",
+        "CREATE INDEX IF NOT EXISTS ix_works_type_date ON works (activity_type, publication_date)",
+        "CREATE INDEX IF NOT EXISTS ix_works_year ON works (year)",
+        "CREATE INDEX IF NOT EXISTS ix_works_publication_date ON works (publication_date)",
+        "CREATE INDEX IF NOT EXISTS ix_users_team_id ON users (team_id)",
+        "CREATE INDEX IF NOT EXISTS ix_users_department_id ON users (department_id)",
+        "CREATE INDEX IF NOT EXISTS ix_teams_department_id ON teams (department_id)",
+    ], [
+        "DROP INDEX IF EXISTS ix_works_user_year",
+        "DROP INDEX IF EXISTS ix_works_type_date",
+        "DROP INDEX IF EXISTS ix_works_year",
+        "DROP INDEX IF EXISTS ix_works_publication_date",
+        "DROP INDEX IF EXISTS ix_users_team_id",
+        "DROP INDEX IF EXISTS ix_users_department_id",
+        "DROP INDEX IF EXISTS ix_teams_department_id",
+    ]),
+    (2, "تحويل عمود التفاصيل إلى JSON مع فهارس حقوله الشائعة", [
+        _normalize_details,
+        _details_to_json,
+    ], [
+        _details_to_text,
+    ]),
+    (3, "جدول ملخص الأعمال والنقاط لكل باحث وسنة ونوع نشاط", [
+        _create_summary,
+    ], [
+        _drop_summary,
+    ]),
+    (4, "فهارس ترقيم قوائم الأعمال حسب (التاريخ، المعرف)", [
+        "CREATE INDEX IF NOT EXISTS ix_works_date_id ON works (publication_date, id)",
+        "CREATE INDEX IF NOT EXISTS ix_works_user_date_id ON works (user_id, publication_date, id)",
+    ], [
+        "DROP INDEX IF EXISTS ix_works_date_id",
+        "DROP INDEX IF EXISTS ix_works_user_date_id",
+    ]),
+    (5, "نص البحث المطبع للأعمال مع فهارس البحث النصي والتقريبي", [
+        _create_search_index,
+    ], [
+        _drop_search_index,
+    ]),
+    (6, "إعادة كتابة التفاصيل بمفاتيح عربية غير مهربة وقيم NULL صريحة", [
+        _rewrite_details,
+    ], []),
+]
+
+# تنفيذ خطوة ترحيل (نص SQL أو دالة تستقبل الاتصال)
+def _run_step(conn, step):
+    if callable(step):
+        step(conn)
+    else:
+        conn.execute(text(step))
+
+# التأكد من وجود جدول إصدار المخطط
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR(255), applied_at TIMESTAMP)"
+    ))
+
+# الإصدار الحالي للمخطط في قاعدة البيانات
+def current_version(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+# ترقية المخطط حتى الإصدار المطلوب (كل ترحيل في معاملة مستقلة)
+def migrate(engine, target=None):
+    applied = []
+    version = current_version(engine)
+    for number, description, upgrade, _ in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        with engine.begin() as conn:
+            for step in upgrade:
+                _run_step(conn, step)
+            conn.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {'v': number, 'd': description, 't': datetime.utcnow()},
+            )
+        applied.append(number)
+    return applied
+
+# التراجع عن الترحيلات الأحدث من الإصدار المطلوب
+def downgrade(engine, target=0):
+    reverted = []
+    version = current_version(engine)
+    for number, _, _, rollback in reversed(MIGRATIONS):
+        if number > version or number <= target:
+            continue
+        with engine.begin() as conn:
+            for step in rollback:
+                _run_step(conn, step)
+            conn.execute(text("DELETE FROM schema_version WHERE version = :v"), {'v': number})
+        reverted.append(number)
+    return reverted
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+# تجهيز المخطط عند بدء التطبيق (مرة واحدة لكل محرك في العملية):
+# إنشاء الجداول الناقصة ثم تطبيق الترحيلات المعلقة؛ قفل استشاري في PostgreSQL حتى لا تتسابق عدة عمليات
+def ensure_schema(engine):
+    if engine in _schema_ready:
+        return
+    with _schema_lock:
+        if engine in _schema_ready:
+            return
+        with engine.connect() as lock_conn:
+            postgres = engine.dialect.name == "postgresql"
+            if postgres:
+                lock_conn.execute(text("SELECT pg_advisory_lock(hashtext('schema_version'))"))
+            try:
+                Base.metadata.create_all(engine)
+                migrate(engine)
+            finally:
+                if postgres:
+                    lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext('schema_version'))"))
+        _schema_ready.add(engine)
+
+if __name__ == "__main__":
+    import sys
+    from app.database import get_engine
+    engine = get_engine()
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(f"schema version {current_version(engine)} -> applied {migrate(engine, target)}")
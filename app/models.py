@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -31,12 +32,20 @@ class Team(Base):
     keywords = Column(String)
     program_desc = Column(Text)
     
-    department_id = Column(Integer, ForeignKey("departments.id"))
+    department_id = Column(Integer, ForeignKey("departments.id"), index=True)
     
     # العلاقات مع النماذج الأخرى
     department = relationship("Department", back_populates="teams")
     members = relationship("User", back_populates="team")
 
+# أنواع العضوية المعروضة للمستخدم
+MEMBER_TYPES = {
+    'permanent': "عضو دائم",
+    'phd_student': "طالب دكتوراه",
+    'affiliate': "عضو منتسب",
+    'associate': "عضو مشارك",
+}
+
 # نموذج مستخدم (User)
 class User(Base):
     __tablename__ = "users"
@@ -48,8 +57,8 @@ class User(Base):
     role = Column(String)  # مثل 'admin', 'dept_head', 'leader', 'researcher'
     member_type = Column(String)  # مثل 'permanent', 'phd_student', 'affiliate', 'associate'
     
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True)
-    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=True, index=True)
+    department_id = Column(Integer, ForeignKey("departments.id"), nullable=True, index=True)
     
     # العلاقات مع النماذج الأخرى
     team = relationship("Team", back_populates="members")
@@ -62,14 +71,53 @@ class Work(Base):
     
     id = Column(Integer, primary_key=True)
     title = Column(Text)
-    details = Column(Text) 
+    # JSONB في PostgreSQL ونص JSON في SQLite؛ None تُخزن NULL وليس النص 'null'
+    details = Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"))
     activity_type = Column(String)  # مثل "مقال في مجلة علمية", "مداخلة في مؤتمر"
     classification = Column(String)  # مثل "A", "B", "Q1", "Q2", "Q3"
-    publication_date = Column(Date)
-    year = Column(Integer)
+    publication_date = Column(Date, index=True)
+    year = Column(Integer, index=True)
     points = Column(Integer)
+    search_text = Column(Text)  # العنوان وقيم التفاصيل مطبعة للبحث (انظر app/search.py)
     
     user_id = Column(Integer, ForeignKey("users.id"))
     
     # العلاقات مع النماذج الأخرى
     researcher = relationship("User", back_populates="works")
+
+    # فهارس مركبة لاستعلامات لوحة القيادة المقيدة بالنطاق (انظر app/migrations.py)
+    __table_args__ = (
+        Index("ix_works_user_year", "user_id", "year"),
+        Index("ix_works_type_date", "activity_type", "publication_date"),
+        # ترقيم keyset لقوائم الأعمال (انظر app/listing.py)
+        Index("ix_works_date_id", "publication_date", "id"),
+        Index("ix_works_user_date_id", "user_id", "publication_date", "id"),
+    )
+
+# القيمة المعروضة للهياكل أو الأنواع غير المحددة
+UNASSIGNED = 'غير محدد'
+
+# ملخص تراكمي للأعمال لكل (باحث، سنة، نوع نشاط) تحدثه خدمات الكتابة في نفس المعاملة (انظر app/summary.py)
+class WorkSummary(Base):
+    __tablename__ = "work_summary"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)  # 0 = سنة غير محددة
+    activity_type = Column(String, primary_key=True)  # UNASSIGNED للنوع غير المحدد
+    works_count = Column(Integer, nullable=False, default=0)
+    points_sum = Column(Integer, nullable=False, default=0)
+
+# حقول التفاصيل الشائعة المفهرسة (الاسم المختصر -> المفتاح داخل JSON)
+DETAIL_KEYS = {
+    'journal': 'المجلة',
+    'conference': 'المؤتمر',
+    'publisher': 'الناشر',
+}
+
+# تعبير SQL لقراءة حقل من التفاصيل كنص حسب نوع قاعدة البيانات
+def detail_sql(dialect, key, column="w.details"):
+    if key not in DETAIL_KEYS.values():
+        raise ValueError(f"حقل تفاصيل غير معروف: {key}")
+    if dialect == "postgresql":
+        return f"({column} ->> '{key}')"
+    return f"json_extract({column}, '$.\"{key}\"')"
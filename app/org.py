@@ -0,0 +1,53 @@
+from app.database import session_scope
+from app.models import Department, Team
+import threading
+
+# فهرس ثابت للهيكل التنظيمي (الأقسام وفرقها) مشترك بين جميع الجلسات
+class OrgTree:
+    def __init__(self, departments, teams, version):
+        # departments: [(id, name_ar)]  teams: [(id, name, department_id)]
+        self.version = version
+        self.department_names = {d_id: name for d_id, name in departments}
+        self.department_ids = {name: d_id for d_id, name in departments}
+        self.team_names = {t_id: name for t_id, name, _ in teams}
+        self.team_department = {t_id: d_id for t_id, _, d_id in teams}
+        self._teams_by_department = {}
+        for t_id, name, d_id in sorted(teams, key=lambda t: (t[1] or "")):
+            self._teams_by_department.setdefault(d_id, []).append(t_id)
+
+    # معرفات الأقسام مرتبة حسب الاسم
+    def departments(self):
+        return sorted(self.department_names, key=lambda d_id: self.department_names[d_id] or "")
+
+    # معرفات فرق قسم معين (أو كل الفرق) مرتبة حسب الاسم
+    def teams_of(self, department_id=None):
+        if department_id is None:
+            return sorted(self.team_names, key=lambda t_id: self.team_names[t_id] or "")
+        return list(self._teams_by_department.get(department_id, []))
+
+_tree = None
+_version = 0
+_tree_lock = threading.Lock()
+
+def _load_tree(version):
+    with session_scope() as s:
+        departments = s.query(Department.id, Department.name_ar).all()
+        teams = s.query(Team.id, Team.name, Team.department_id).all()
+    return OrgTree(departments, teams, version)
+
+# الهيكل التنظيمي المحمّل مرة واحدة لكل عملية
+def get_org_tree():
+    global _tree
+    tree = _tree
+    if tree is None or tree.version != _version:
+        with _tree_lock:
+            if _tree is None or _tree.version != _version:
+                _tree = _load_tree(_version)
+            tree = _tree
+    return tree
+
+# يُستدعى بعد أي تعديل على الأقسام أو الفرق
+def invalidate_org_tree():
+    global _version
+    with _tree_lock:
+        _version += 1
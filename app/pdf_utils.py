@@ -1,38 +1,80 @@
 from fpdf import FPDF
 import arabic_reshaper
 from bidi.algorithm import get_display
+from functools import lru_cache
 import os
-import requests
+import threading
+import time
+from app.models import MEMBER_TYPES
+from app.metrics import timed, count_error
 
-# التأكد من وجود خط اللغة العربية
+FONT_FILENAME = "Amiri-Regular.ttf"
+FONT_URL = "https://github.com/google/fonts/raw/main/ofl/amiri/Amiri-Regular.ttf"
+# الخط المضمّن في المستودع أولاً، ثم النسخة القديمة في مجلد العمل
+VENDORED_FONT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "fonts", FONT_FILENAME)
+
+# مهلة إعادة محاولة التنزيل بعد الفشل (تتضاعف حتى الحد الأقصى)
+FONT_RETRY_SECONDS = 60
+FONT_RETRY_MAX_SECONDS = 3600
+
+_font_path = None
+_font_retry_at = 0.0
+_font_retry_delay = FONT_RETRY_SECONDS
+_font_lock = threading.Lock()
+
+# تحميل الخط من الشبكة مرة واحدة وحفظه بجانب الخطوط المضمّنة
+def _download_font():
+    try:
+        import requests
+        response = requests.get(FONT_URL, timeout=10)
+        if response.status_code == 200:
+            os.makedirs(os.path.dirname(VENDORED_FONT), exist_ok=True)
+            with open(VENDORED_FONT, "wb") as f:
+                f.write(response.content)
+            return VENDORED_FONT
+    except Exception as e:
+        count_error("download_font", e)
+    return None
+
+# التأكد من وجود خط اللغة العربية (يُحسم مرة واحدة لكل عملية عند النجاح)
+# عند فشل التنزيل لا نعيد المحاولة في كل مستند (مهلة 10 ثوانٍ) بل بعد مهلة متزايدة
 def ensure_font_exists():
-    font_path = "Amiri-Regular.ttf"
-    if not os.path.exists(font_path):
-        try:
-            url = "https://github.com/google/fonts/raw/main/ofl/amiri/Amiri-Regular.ttf"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                with open(font_path, "wb") as f:
-                    f.write(response.content)
-                return font_path
-            else:
-                return None
-        except:
-            return None
-    return font_path
+    global _font_path, _font_retry_at, _font_retry_delay
+    if _font_path is None and time.monotonic() >= _font_retry_at:
+        with _font_lock:
+            if _font_path is None and time.monotonic() >= _font_retry_at:
+                for path in (VENDORED_FONT, FONT_FILENAME):
+                    if os.path.exists(path):
+                        _font_path = path
+                        break
+                else:
+                    _font_path = _download_font()
+                    if _font_path is None:
+                        _font_retry_at = time.monotonic() + _font_retry_delay
+                        _font_retry_delay = min(_font_retry_delay * 2, FONT_RETRY_MAX_SECONDS)
+    return _font_path
 
-# معالجة النص العربي لـ FPDF
-def process_text_for_pdf(text):
-    """معالجة النص العربي لـ FPDF"""
-    if not text: return ""
-    text = str(text) 
+@lru_cache(maxsize=8192)
+def _shape(text):
     try:
         reshaped_text = arabic_reshaper.reshape(text)
-        bidi_text = get_display(reshaped_text)
-        return bidi_text
-    except:
+        return get_display(reshaped_text)
+    except (ValueError, TypeError, KeyError, IndexError) as e:
+        count_error("shape_text", e)
         return text
 
+# معالجة النص العربي لـ FPDF
+def process_text_for_pdf(text):
+    """معالجة النص العربي لـ FPDF (النتائج محفوظة لإعادة الاستخدام)"""
+    if not text: return ""
+    return _shape(str(text))
+
+# العناوين الثابتة معالجة مسبقاً مرة واحدة
+LABELS = {
+    'works_header': process_text_for_pdf("قائمة الأنشطة والنتاجات العلمية"),
+    'no_works': process_text_for_pdf("لا توجد أعمال مسجلة حتى الآن."),
+}
+
 # فئة PDF لإنشاء ملفات PDF
 class PDF(FPDF):
     def header(self):
@@ -47,36 +89,58 @@ class PDF(FPDF):
             self.set_font('helvetica', '', 8)
         self.cell(0, 10, f'Page {self.page_no()}', align='C')
 
+# بيانات رأس السيرة الذاتية من لقطة CurrentUser: (الاسم، الصفة، الهيكل)
+def cv_identity(user):
+    role_str = MEMBER_TYPES.get(user.member_type, user.role)
+    u_role = role_str if role_str else "غير محدد"
+    u_team = user.team_name or user.department_name or 'غير محدد'
+    return user.full_name, u_role, u_team
+
 # دالة لإنشاء السيرة الذاتية (CV) بصيغة PDF
+@timed("generate_cv_pdf")
 def generate_cv_pdf(user, df_works):
-    font_path = ensure_font_exists()
-    
-    if not font_path:
-        st.error("فشل تحميل خط اللغة العربية. سيتم استخدام الخط الافتراضي.")
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("helvetica", '', 12)
-        pdf.cell(0, 10, "Arabic font not loaded.", ln=True)
-        return bytes(pdf.output())
+    return render_cv_pdf(*cv_identity(user), df_works)
+
+# تحضير أقسام قائمة الأعمال مسبقاً: [(عنوان النوع، [أسطر الأعمال])] بنصوص معالجة
+def cv_sections(df_works):
+    # فرز البيانات: النوع، ثم السنة تنازلياً
+    df_sorted = df_works.sort_values(by=['activity_type', 'year'], ascending=[True, False])
+    types = df_sorted['activity_type'].tolist()
+    titles = df_sorted['title'].tolist()
+    dates = df_sorted['publication_date'].tolist()
 
+    sections = []
+    current_type = None
+    for i, atype in enumerate(types):
+        # قسم جديد عند تغير النوع (نفس مقارنة != السابقة، بما فيها القيم الفارغة)
+        if i == 0 or atype != current_type:
+            current_type = atype
+            sections.append((process_text_for_pdf(f"• {atype}"), []))
+        sections[-1][1].append(process_text_for_pdf(f"- {titles[i]} ({dates[i]})"))
+    return sections
+
+# مستند جديد بالخط العربي
+# ملاحظة: add_font يعيد تحليل ملف TTF في كل مستند؛ كائن الخط في fpdf2 يحمل حالة المستند
+# (رقم الخط ومجموعة المحارف المستعملة للتضمين) فلا يُشارك بين المستندات. ما يُعاد استعماله
+# فعلاً هو مسار الخط المحسوم مرة واحدة والنصوص المشكّلة (_shape)
+def _new_cv_document(font_path):
     pdf = FPDF()
     # تفعيل الفاصل التلقائي
     pdf.set_auto_page_break(auto=True, margin=15) 
     
     pdf.add_font('Amiri', '', font_path)
     pdf.add_page()
-    
+    return pdf
+
+# رأس السيرة وعنوان قائمة الأنشطة
+def _render_cv_header(pdf, full_name, u_role, u_team):
     # --- الرأس ---
     pdf.set_font("Amiri", '', 18)
-    title = process_text_for_pdf(f"السيرة الذاتية الأكاديمية: {user.full_name}")
+    title = process_text_for_pdf(f"السيرة الذاتية الأكاديمية: {full_name}")
     pdf.cell(0, 10, title, new_x="LMARGIN", new_y="NEXT", align='C')
     pdf.ln(5)
 
     pdf.set_font("Amiri", '', 11)
-    role_str = MEMBER_TYPES.get(user.member_type, user.role)
-    u_role = role_str if role_str else "غير محدد"
-    u_team = user.team.name if user.team else (user.department.name_ar if user.department else 'غير محدد')
-
     role_text = process_text_for_pdf(f"الصفة: {u_role}")
     team_text = process_text_for_pdf(f"الهيكل: {u_team}")
     
@@ -86,54 +150,56 @@ def generate_cv_pdf(user, df_works):
     
     # --- عنوان القائمة ---
     pdf.set_font("Amiri", '', 14)
-    header = process_text_for_pdf("قائمة الأنشطة والنتاجات العلمية")
+    header = LABELS['works_header']
     pdf.set_draw_color(150, 150, 150)
     pdf.cell(0, 10, header, new_x="LMARGIN", new_y="NEXT", align='R')
     pdf.line(10, pdf.get_y(), 200, pdf.get_y())
     pdf.ln(5)
-    
-    if not df_works.empty:
-        # فرز البيانات: النوع، ثم السنة تنازلياً
-        df_sorted = df_works.sort_values(by=['activity_type', 'year'], ascending=[True, False])
-        
-        current_type = None
+
+# طباعة الأقسام المحضرة مسبقاً
+def _render_cv_sections(pdf, sections):
+    for type_title, lines in sections:
+        if pdf.get_y() > 250: 
+            pdf.add_page()
+        else: 
+            pdf.ln(3)
         
-        for index, row in df_sorted.iterrows():
-            # طباعة العنوان فقط عند التغيير
-            if row['activity_type'] != current_type:
-                current_type = row['activity_type']
-                
-                if pdf.get_y() > 250: 
-                    pdf.add_page()
-                else: 
-                    pdf.ln(3)
-                
-                pdf.set_font("Amiri", '', 13)
-                pdf.set_text_color(30, 60, 140)
-                type_title = process_text_for_pdf(f"• {current_type}")
-                
-                # ضبط X دائماً لليسار قبل الطباعة
-                pdf.set_x(10)
-                # w=190 (تقريباً عرض A4 ناقص الهوامش) لتجنب خطأ المساحة
-                pdf.cell(190, 8, type_title, ln=True, align='R')
-            
-            # طباعة التفاصيل
-            pdf.set_text_color(0, 0, 0)
-            pdf.set_font("Amiri", '', 11)
-            
-            title_clean = str(row['title'])
-            date_clean = str(row['publication_date'])
-            full_text = f"- {title_clean} ({date_clean})"
-            final_text = process_text_for_pdf(full_text)
-            
-            # ضبط X دائماً لليسار قبل الطباعة
+        pdf.set_font("Amiri", '', 13)
+        pdf.set_text_color(30, 60, 140)
+        # ضبط X دائماً لليسار قبل الطباعة
+        pdf.set_x(10)
+        # w=190 (تقريباً عرض A4 ناقص الهوامش) لتجنب خطأ المساحة
+        pdf.cell(190, 8, type_title, ln=True, align='R')
+
+        # طباعة التفاصيل (الخط واللون ثابتان داخل القسم)
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Amiri", '', 11)
+        for final_text in lines:
             pdf.set_x(10) 
             # w=190 لضمان وجود مساحة كافية للالتفاف وعدم ظهور خطأ
             pdf.multi_cell(190, 6, final_text, align='R')
-            
+
+# إنشاء ملف السيرة من بيانات بسيطة قابلة للنقل بين العمليات
+def render_cv_pdf(full_name, u_role, u_team, df_works):
+    font_path = ensure_font_exists()
+    
+    if not font_path:
+        import streamlit as st
+        st.error("فشل تحميل خط اللغة العربية. سيتم استخدام الخط الافتراضي.")
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("helvetica", '', 12)
+        pdf.cell(0, 10, "Arabic font not loaded.", ln=True)
+        return bytes(pdf.output())
+
+    pdf = _new_cv_document(font_path)
+    _render_cv_header(pdf, full_name, u_role, u_team)
+    
+    if not df_works.empty:
+        _render_cv_sections(pdf, cv_sections(df_works))
     else:
         pdf.set_font("Amiri", '', 12)
-        no_data = process_text_for_pdf("لا توجد أعمال مسجلة حتى الآن.")
+        no_data = LABELS['no_works']
         pdf.set_x(10)
         pdf.cell(190, 10, no_data, ln=True, align='R')
         
@@ -0,0 +1,112 @@
+from app.database import get_engine
+from app.services import build_scoped_query, UNASSIGNED
+from app.utils import normalize_arabic
+from app.metrics import timed, count_error
+from sqlalchemy import text
+import pandas as pd
+import time
+
+# البحث في works.search_text (العنوان وقيم التفاصيل مطبعة بـ normalize_arabic):
+# PostgreSQL: فهرس tsvector للكلمات + فهرس pg_trgm للبحث التقريبي
+# SQLite: جدول FTS5 works_fts (الترحيل 5)، وLIKE إذا لم تتوفر FTS5
+
+SEARCH_PAGE_SIZE = 20
+
+SEARCH_COLUMNS = f"""
+    w.id, w.title, COALESCE(w.activity_type, '{UNASSIGNED}') AS activity_type, w.publication_date,
+    u.full_name AS researcher, COALESCE(t.name, '{UNASSIGNED}') AS team"""
+
+PG_SEARCH_QUERY = f"""
+SELECT {SEARCH_COLUMNS},
+    ts_rank(to_tsvector('simple', w.search_text), to_tsquery('simple', :tsq)) + similarity(w.search_text, :q) AS score
+FROM works w
+JOIN users u ON w.user_id = u.id
+LEFT JOIN teams t ON u.team_id = t.id
+"""
+FTS_SEARCH_QUERY = f"""
+SELECT {SEARCH_COLUMNS}, -works_fts.rank AS score
+FROM works_fts
+JOIN works w ON w.id = works_fts.rowid
+JOIN users u ON w.user_id = u.id
+LEFT JOIN teams t ON u.team_id = t.id
+"""
+LIKE_SEARCH_QUERY = f"""
+SELECT {SEARCH_COLUMNS}, 0 AS score
+FROM works w
+JOIN users u ON w.user_id = u.id
+LEFT JOIN teams t ON u.team_id = t.id
+"""
+
+# هل يوجد جدول FTS5 في قاعدة SQLite الحالية؟ الوجود يُحفظ نهائياً لكل محرك،
+# والغياب يُعاد فحصه بعد FTS_RECHECK_SECONDS (قد يُطبق الترحيل 5 بعد بدء العملية)
+FTS_RECHECK_SECONDS = 60
+_fts_tables = {}  # engine -> (موجود، وقت الفحص)
+
+def _has_fts(engine):
+    found, checked_at = _fts_tables.get(engine, (False, None))
+    if found or (checked_at is not None and time.monotonic() - checked_at < FTS_RECHECK_SECONDS):
+        return found
+    with engine.connect() as conn:
+        found = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'works_fts'")).first() is not None
+    _fts_tables[engine] = (found, time.monotonic())
+    return found
+
+# شروط البحث ونص الاستعلام حسب قاعدة البيانات
+def _search_plan(engine, terms):
+    if engine.dialect.name == "postgresql":
+        # كل كلمة كبادئة، مع قبول التطابق التقريبي لكامل العبارة
+        tsq = " & ".join(f"{t}:*" for t in terms)
+        cond = "(to_tsvector('simple', w.search_text) @@ to_tsquery('simple', :tsq) OR w.search_text % :q)"
+        return PG_SEARCH_QUERY, [cond], {'tsq': tsq, 'q': " ".join(terms)}, "score DESC, w.id DESC"
+    if engine.dialect.name == "sqlite" and _has_fts(engine):
+        match = " ".join(f'"{t}"*' for t in terms)
+        return FTS_SEARCH_QUERY, ["works_fts MATCH :match"], {'match': match}, "works_fts.rank, w.id DESC"
+    conds, params = [], {}
+    for i, t in enumerate(terms):
+        conds.append(f"w.search_text LIKE :term_{i}")
+        params[f'term_{i}'] = f"%{t}%"
+    return LIKE_SEARCH_QUERY, conds, params, "w.publication_date DESC, w.id DESC"
+
+# بحث مرتب ومقسم إلى صفحات في أعمال النطاق
+# تُرجع (إطار النتائج مع score، هل توجد صفحة تالية)
+@timed("search_works")
+def search_works(scope, query, page=0, page_size=SEARCH_PAGE_SIZE):
+    terms = normalize_arabic(query).split()
+    if not terms:
+        return pd.DataFrame(), False
+    engine = get_engine()
+    base_q, conds, params, order = _search_plan(engine, terms)
+    q, params = build_scoped_query(scope, base_q=base_q, conditions=conds, params=params)
+    q = text(f"{q.text} ORDER BY {order} LIMIT :limit OFFSET :offset")
+    params.update(limit=page_size + 1, offset=page * page_size)
+    try:
+        df = pd.read_sql(q, engine, params=params)
+    except Exception as e:
+        count_error("search_works", e)
+        return pd.DataFrame(), False
+    has_more = len(df) > page_size
+    df = df.head(page_size).copy()
+    df['publication_date'] = pd.to_datetime(df['publication_date']).dt.date
+    return df, has_more
+
+# البحث في الفرق بالاسم والكلمات المفتاحية والمجالات (جدول صغير: المطابقة في بايثون)
+@timed("search_teams")
+def search_teams(query, limit=10):
+    terms = normalize_arabic(query).split()
+    if not terms:
+        return []
+    try:
+        with get_engine().connect() as conn:
+            teams = conn.execute(text("SELECT id, name, keywords, domains, department_id FROM teams")).fetchall()
+    except Exception as e:
+        count_error("search_teams", e)
+        return []
+    hits = []
+    for t in teams:
+        words = normalize_arabic(" ".join(filter(None, (t.name, t.keywords, t.domains)))).split()
+        score = sum(1 for term in terms if any(w.startswith(term) for w in words))
+        if score:
+            hits.append((score, t))
+    hits.sort(key=lambda h: (-h[0], h[1].name or ""))
+    return [{'id': t.id, 'name': t.name, 'keywords': t.keywords, 'domains': t.domains, 'department_id': t.department_id, 'score': score}
+            for score, t in hits[:limit]]
@@ -1,116 +1,393 @@
-from app.database import SessionLocal
-from app.models import Work, User
-import bcrypt
+from app.database import SessionLocal, get_engine
+from app.models import Work, User, detail_sql, UNASSIGNED
+from app.cache import ScopedCache, data_version, invalidate_scopes
+from app.summary import record_works
+from app.utils import work_search_text
+from app.metrics import timed, count_error
+from app.auth import hash_password, bump_identity_version
+from sqlalchemy import text
+import pandas as pd
 import json
+import os
 from datetime import date
 
+# ذاكرة مؤقتة لبيانات كل نطاق (مشتركة بين جميع الجلسات)
+dataset_cache = ScopedCache(
+    "datasets",
+    ttl=int(os.environ.get("DATASET_CACHE_TTL", 300)),
+    max_bytes=int(os.environ.get("DATASET_CACHE_MAX_MB", 256)) * 1024 * 1024,
+)
+# ذاكرة مؤقتة صغيرة لنتائج تجميعات لوحة القيادة حسب (النطاق، المرشحات)
+aggregates_cache = ScopedCache("aggregates", ttl=int(os.environ.get("DATASET_CACHE_TTL", 300)), max_bytes=32 * 1024 * 1024)
+
+# الاستعلام الأساسي للأعمال مع بيانات الباحث والهيكل
+WORKS_SELECT = """
+SELECT 
+    w.id, w.user_id, w.title, w.activity_type, w.publication_date, w.year, w.points, w.classification{details},
+    u.full_name as researcher, u.team_id, u.department_id,
+    t.name as team, 
+    d.name_ar as department
+FROM works w
+JOIN users u ON w.user_id = u.id
+LEFT JOIN teams t ON u.team_id = t.id
+LEFT JOIN departments d ON u.department_id = d.id 
+"""
+WORKS_BASE_QUERY = WORKS_SELECT.format(details=", w.details")
+# نفس الاستعلام دون التفاصيل (أثقل عمود في الإطار ولا تحتاجه لوحة القيادة)
+WORKS_COMPACT_QUERY = WORKS_SELECT.format(details="")
+
+# أعمدة نصية قليلة القيم المختلفة تُخزن كفئات بدل تكرار النص في كل صف
+CATEGORY_COLUMNS = ['department', 'team', 'activity_type', 'classification', 'researcher']
+
+# العمود المستخدم لتقييد كل نطاق (بالمعرفات وليس بالأسماء)
+SCOPE_COLUMNS = {
+    'department': "u.department_id",
+    'team': "u.team_id",
+    'user': "w.user_id",
+}
+
+# النطاقات التي تظهر فيها أعمال باحث معين
+def work_scopes(uid, team_id, department_id):
+    scopes = [('admin', None), ('user', uid)]
+    if team_id:
+        scopes.append(('team', team_id))
+    if department_id:
+        scopes.append(('department', department_id))
+    return scopes
+
+# نطاقات باحث اعتماداً على فرقته وقسمه الحاليين
+def _user_scopes(s, uid):
+    row = s.query(User.team_id, User.department_id).filter(User.id == uid).first()
+    return work_scopes(uid, row.team_id, row.department_id) if row else work_scopes(uid, None, None)
+
+# التفاصيل تُخزن ككائن JSON (يقبل نص JSON أو قاموساً)
+def parse_details(details):
+    if isinstance(details, str):
+        return json.loads(details) if details.strip() else None
+    return details
+
 # إضافة عمل (Work) جديد
+@timed("add_work_service")
 def add_work_service(uid, title, details_json, atype, cls, date_obj, pts):
     s = SessionLocal()
     try:
-        s.add(Work(user_id=uid, title=title, details=details_json, activity_type=atype, classification=cls, publication_date=date_obj, year=date_obj.year, points=pts))
+        details = parse_details(details_json)
+        s.add(Work(user_id=uid, title=title, details=details, activity_type=atype, classification=cls, publication_date=date_obj, year=date_obj.year, points=pts, search_text=work_search_text(title, details)))
+        record_works(s, [(uid, date_obj.year, atype, pts)])
         s.commit()
+        invalidate_scopes(_user_scopes(s, uid))
         return True
     except Exception as e:
+        count_error("add_work_service", e)
         s.rollback()
         return False
     finally:
         s.close()
 
 # تحديث العمل (Work) بناءً على ID
+@timed("update_work_service")
 def update_work_service(wid, title, date_obj):
     s = SessionLocal()
     try:
         w = s.query(Work).filter(Work.id == wid).first()
+        # نقل العمل في الملخص من سنته القديمة إلى الجديدة
+        record_works(s, [(w.user_id, w.year, w.activity_type, w.points)], sign=-1)
         w.title = title
+        w.search_text = work_search_text(title, w.details)
         w.publication_date = date_obj
         w.year = date_obj.year
+        record_works(s, [(w.user_id, w.year, w.activity_type, w.points)])
         s.commit()
+        invalidate_scopes(_user_scopes(s, w.user_id))
         return True
     except Exception as e:
+        count_error("update_work_service", e)
         s.rollback()
         return False
     finally:
         s.close()
 
 # حذف العمل (Work) بناءً على ID
+@timed("delete_work_service")
 def delete_work_service(wid):
     s = SessionLocal()
     try:
+        row = s.query(Work.user_id, Work.year, Work.activity_type, Work.points).filter(Work.id == wid).first()
+        uid = row.user_id if row else None
         s.query(Work).filter(Work.id == wid).delete()
+        if row:
+            record_works(s, [tuple(row)], sign=-1)
         s.commit()
+        if uid is not None:
+            invalidate_scopes(_user_scopes(s, uid))
         return True
     except Exception as e:
+        count_error("delete_work_service", e)
         s.rollback()
         return False
     finally:
         s.close()
 
 # تغيير كلمة المرور للمستخدم بناءً على ID
+@timed("change_password")
 def change_password(uid, new_p):
     s = SessionLocal()
     try:
         user = s.query(User).filter(User.id == uid).first()
-        user.password_hash = bcrypt.hashpw(new_p.encode(), bcrypt.gensalt()).decode()
+        user.password_hash = hash_password(new_p)
         s.commit()
+        bump_identity_version(uid)
         return True
     except Exception as e:
+        count_error("change_password", e)
         s.rollback()
         return False
     finally:
         s.close()
 
+# تحديد نطاق البيانات المسموح به حسب دور المستخدم
+def get_user_scope(user):
+    if user.role == 'admin':
+        return ('admin', None)
+    elif user.role == 'dept_head':
+        return ('department', user.department_id) if user.department_id else None
+    elif user.role == 'leader':
+        return ('team', user.team_id) if user.team_id else None
+    else:
+        return ('user', user.id)
+
+# شروط النطاق مع معاملاتها المربوطة
+def scope_conditions(scope):
+    kind, scope_id = scope
+    if kind == 'admin':
+        return [], {}
+    return [f"{SCOPE_COLUMNS[kind]} = :scope_id"], {'scope_id': scope_id}
+
+# بناء استعلام مقيد بالنطاق (مع شروط إضافية اختيارية)
+def build_scoped_query(scope, base_q=WORKS_BASE_QUERY, conditions=None, params=None):
+    conds, bound = scope_conditions(scope)
+    conds = conds + list(conditions or [])
+    bound.update(params or {})
+    q = base_q
+    if conds:
+        q += " WHERE " + " AND ".join(conds)
+    return text(q), bound
+
+# تحويل إطار الأعمال إلى تمثيل عمودي مضغوط: فئات، تواريخ datetime64، وأعداد صحيحة مصغرة
+def compact_works_frame(df):
+    for col in ('department', 'team', 'activity_type'):
+        df[col] = df[col].fillna(UNASSIGNED)
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype('category')
+    df['publication_date'] = pd.to_datetime(df['publication_date'])
+    for col in ('id', 'user_id', 'year', 'points'):
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    # معرفات الهياكل قد تكون فارغة: أعداد صحيحة قابلة للقيمة الفارغة بدل float64
+    for col in ('team_id', 'department_id'):
+        df[col] = df[col].astype('Int32')
+    return df
+
 # استعلام البيانات الذكية (smart data) بناءً على الدور
-def get_smart_data(user):
-    base_q = """
-    SELECT 
-        w.id, w.user_id, w.title, w.activity_type, w.publication_date, w.year, w.points, w.classification, w.details,
-        u.full_name as researcher, 
-        t.name as team, 
-        d.name_ar as department
+# with_details: إضافة عمود التفاصيل (يُستبعد افتراضياً لتوفير الذاكرة)
+# تُرجع نسخة خاصة بالمستدعي: تعديلها لا يمس الإطار المشترك بين جلسات النطاق
+@timed("get_smart_data")
+def get_smart_data(user, with_details=False):
+    return shared_smart_data(user, with_details).copy()
+
+# الإطار المحفوظ نفسه دون نسخ، للمستهلكين الذين يقرؤون فقط (مثل FilterEngine)
+# يُمنع تعديله: أي تغيير يظهر لكل مستخدمي النطاق حتى انتهاء صلاحية الذاكرة المؤقتة
+def shared_smart_data(user, with_details=False):
+    scope = get_user_scope(user)
+    if scope is None:
+        return pd.DataFrame()
+    key = (scope, 'details') if with_details else scope
+    cached = dataset_cache.get(key)
+    if cached is not None:
+        return cached
+    # إصدار النطاق قبل القراءة: كتابة أثناء القراءة تعني أن الإطار قد يكون قديماً فلا يبقى محفوظاً
+    # (الفحص بعد الحفظ يغطي كتابة تقع بين الفحص والحفظ، لأن invalidate_scopes يرفع الإصدار قبل الإبطال)
+    version = data_version(scope)
+    try:
+        # استعلام بيانات النطاق فقط من قاعدة البيانات
+        q, params = build_scoped_query(scope, base_q=WORKS_BASE_QUERY if with_details else WORKS_COMPACT_QUERY)
+        df = compact_works_frame(pd.read_sql(q, get_engine(), params=params))
+        if data_version(scope) != version:
+            return df
+        dataset_cache.set(key, df)
+        if data_version(scope) != version:
+            dataset_cache.invalidate([scope])
+        return df
+    except Exception as e:
+        count_error("get_smart_data", e)
+        return pd.DataFrame()
+
+# مجموعات التجميع المحسوبة في استعلام واحد للوحة القيادة
+AGGREGATES_QUERY = """
+WITH f AS (
+    SELECT w.user_id, w.year, COALESCE(w.points, 0) AS points,
+        COALESCE(w.activity_type, '{na}') AS activity_type,
+        u.full_name AS researcher,
+        COALESCE(d.name_ar, '{na}') AS department,
+        COALESCE(t.name, '{na}') AS team
     FROM works w
     JOIN users u ON w.user_id = u.id
     LEFT JOIN teams t ON u.team_id = t.id
-    LEFT JOIN departments d ON u.department_id = d.id 
-    """
+    LEFT JOIN departments d ON u.department_id = d.id
+    {where}
+)
+SELECT 'total' AS grp, NULL AS k1, NULL AS k2, COUNT(*) AS n, SUM(points) AS points, COUNT(DISTINCT user_id) AS researchers FROM f
+UNION ALL
+SELECT 'researcher', researcher, CAST(user_id AS VARCHAR(20)), COUNT(*), SUM(points), NULL FROM f GROUP BY user_id, researcher
+UNION ALL
+SELECT 'structure', department, team, COUNT(*), SUM(points), NULL FROM f GROUP BY department, team
+UNION ALL
+SELECT 'type', activity_type, NULL, COUNT(*), SUM(points), NULL FROM f GROUP BY activity_type
+UNION ALL
+SELECT 'year', CAST(year AS VARCHAR(8)), NULL, COUNT(*), SUM(points), NULL FROM f GROUP BY year
+"""
+
+# نفس المجموعات من جدول الملخص: O(الباحثين × السنوات × الأنواع) بدل O(الأعمال)
+SUMMARY_AGGREGATES_QUERY = """
+WITH f AS (
+    SELECT w.user_id, w.year, w.works_count AS n, w.points_sum AS points, w.activity_type,
+        u.full_name AS researcher,
+        COALESCE(d.name_ar, '{na}') AS department,
+        COALESCE(t.name, '{na}') AS team
+    FROM work_summary w
+    JOIN users u ON w.user_id = u.id
+    LEFT JOIN teams t ON u.team_id = t.id
+    LEFT JOIN departments d ON u.department_id = d.id
+    {where}
+)
+SELECT 'total' AS grp, NULL AS k1, NULL AS k2, COALESCE(SUM(n), 0) AS n, SUM(points) AS points, COUNT(DISTINCT user_id) AS researchers FROM f
+UNION ALL
+SELECT 'researcher', researcher, CAST(user_id AS VARCHAR(20)), SUM(n), SUM(points), NULL FROM f GROUP BY user_id, researcher
+UNION ALL
+SELECT 'structure', department, team, SUM(n), SUM(points), NULL FROM f GROUP BY department, team
+UNION ALL
+SELECT 'type', activity_type, NULL, SUM(n), SUM(points), NULL FROM f GROUP BY activity_type
+UNION ALL
+SELECT 'year', CASE WHEN year = 0 THEN NULL ELSE CAST(year AS VARCHAR(8)) END, NULL, SUM(n), SUM(points), NULL FROM f GROUP BY year
+"""
+
+# شرط مطابقة عمود مع قيمة (UNASSIGNED تعني القيمة الفارغة)
+def _match_condition(column, value, name):
+    if value is None:
+        return None, {}
+    if value == UNASSIGNED:
+        return f"{column} IS NULL", {}
+    return f"{column} = :{name}", {name: value}
+
+# شروط مرشحات لوحة القيادة (السنة تتجاوز نطاق التاريخ)
+# details: أزواج (المفتاح، القيمة) لحقول التفاصيل المفهرسة، تُطابق داخل SQL
+def dashboard_filter_conditions(date_from=None, date_to=None, year=None, dept=None, team=None, atype=None, details=None):
+    conds, params = [], {}
+    if year is not None:
+        conds.append("w.year = :year")
+        params['year'] = int(year)
+    else:
+        if date_from is not None:
+            conds.append("w.publication_date >= :date_from")
+            params['date_from'] = date_from
+        if date_to is not None:
+            conds.append("w.publication_date <= :date_to")
+            params['date_to'] = date_to
+    for column, value, name in (("u.department_id", dept, 'dept_id'), ("u.team_id", team, 'team_id'), ("w.activity_type", atype, 'atype')):
+        cond, bound = _match_condition(column, value, name)
+        if cond:
+            conds.append(cond)
+            params.update(bound)
+    dialect = get_engine().dialect.name if details else None
+    for i, (key, value) in enumerate(dict(details or {}).items()):
+        conds.append(f"{detail_sql(dialect, key)} = :detail_{i}")
+        params[f'detail_{i}'] = value
+    return conds, params
+
+# شروط المرشحات على جدول الملخص، أو None إذا تعذر التعبير عنها بالسنوات
+# (نطاق تاريخ لا يبدأ في 1 جانفي أو لا ينتهي في 31 ديسمبر يتطلب جدول الأعمال)
+def summary_filter_conditions(date_from=None, date_to=None, year=None, dept=None, team=None, atype=None):
+    conds, params = [], {}
+    if year is not None:
+        conds.append("w.year = :year")
+        params['year'] = int(year)
+    else:
+        if date_from is not None:
+            if (date_from.month, date_from.day) != (1, 1):
+                return None
+            conds.append("w.year >= :year_from")
+            params['year_from'] = date_from.year
+        if date_to is not None:
+            if (date_to.month, date_to.day) != (12, 31):
+                return None
+            conds.append("w.year <= :year_to")
+            params['year_to'] = date_to.year
+    for column, value, name in (("u.department_id", dept, 'dept_id'), ("u.team_id", team, 'team_id')):
+        cond, bound = _match_condition(column, value, name)
+        if cond:
+            conds.append(cond)
+            params.update(bound)
+    # النوع غير المحدد مخزن في الملخص بقيمة UNASSIGNED نفسها
+    if atype is not None:
+        conds.append("w.activity_type = :atype")
+        params['atype'] = atype
+    return conds, params
+
+# إسقاط حقول من التفاصيل كأعمدة داخل SQL (دون فك JSON في بايثون)
+@timed("get_detail_fields")
+def get_detail_fields(scope, keys, **filters):
+    dialect = get_engine().dialect.name
+    cols = ", ".join(f'{detail_sql(dialect, key)} AS "{key}"' for key in keys)
+    conds, params = dashboard_filter_conditions(**filters)
+    base_q = f"SELECT w.id, w.title, {cols} FROM works w JOIN users u ON w.user_id = u.id"
+    q, params = build_scoped_query(scope, base_q=base_q, conditions=conds, params=params)
     try:
-        # استعلام البيانات من قاعدة البيانات
-        df = pd.read_sql(base_q, engine)
-        df['department'] = df['department'].fillna('غير محدد')
-        df['team'] = df['team'].fillna('غير محدد')
-        df['activity_type'] = df['activity_type'].fillna('غير محدد')
-        df['publication_date'] = pd.to_datetime(df['publication_date']).dt.date
-        
-        if df.empty: 
-            return df
-        if user.role == 'admin': 
-            return df
-        elif user.role == 'dept_head': 
-            if user.department: 
-                return df[df['department'] == user.department.name_ar]
-            return pd.DataFrame()
-        elif user.role == 'leader': 
-            if user.team: 
-                return df[df['team'] == user.team.name]
-            return pd.DataFrame()
-        else: 
-            return df[df['user_id'] == user.id]
-    except Exception as e: 
+        return pd.read_sql(q, get_engine(), params=params)
+    except Exception as e:
+        count_error("get_detail_fields", e)
         return pd.DataFrame()
 
-# تحويل البيانات إلى تنسيق Excel
-def to_excel(df):
+# مؤشرات ومخططات لوحة القيادة محسوبة في قاعدة البيانات برحلة واحدة (من الملخص متى أمكن)
+@timed("dashboard_aggregates")
+def dashboard_aggregates(scope, date_from=None, date_to=None, year=None, dept=None, team=None, atype=None, details=None):
+    details = tuple(sorted(dict(details or {}).items()))
+    key = (scope, date_from, date_to, year, dept, team, atype, details)
+    cached = aggregates_cache.get(key)
+    if cached is not None:
+        return cached
+    conds, params = scope_conditions(scope)
+    # الملخص يكفي ما لم تُطلب حقول تفاصيل أو نطاق تاريخ جزئي من السنة
+    summary = None if details else summary_filter_conditions(date_from, date_to, year, dept, team, atype)
+    if summary is not None:
+        query, (f_conds, f_params) = SUMMARY_AGGREGATES_QUERY, summary
+    else:
+        query, (f_conds, f_params) = AGGREGATES_QUERY, dashboard_filter_conditions(date_from, date_to, year, dept, team, atype, details)
+    conds += f_conds
+    params.update(f_params)
+    where = "WHERE " + " AND ".join(conds) if conds else ""
     try:
-        output = io.BytesIO()
-        export_df = df.copy()
-        if 'details' in export_df.columns:
-            export_df['تفاصيل'] = export_df['details'].apply(lambda x: " | ".join([f"{k}:{v}" for k,v in json.loads(x).items() if v]) if x else "")
-        cols_map = {'title': 'العنوان', 'activity_type': 'النوع', 'publication_date': 'التاريخ', 'points': 'النقاط', 'researcher': 'الباحث', 'team': 'الفرقة'}
-        export_df = export_df.rename(columns=cols_map)
-        final_cols = [c for c in cols_map.values() if c in export_df.columns] + ['تفاصيل']
-        export_df = export_df[final_cols] if not export_df.empty else export_df
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            export_df.to_excel(writer, index=False, sheet_name='التقرير')
-        return output.getvalue()
+        rows = pd.read_sql(text(query.format(na=UNASSIGNED, where=where)), get_engine(), params=params)
     except Exception as e:
+        count_error("dashboard_aggregates", e)
         return None
+    rows['points'] = rows['points'].fillna(0).astype(int)
+    total = rows[rows['grp'] == 'total'].iloc[0]
+
+    researchers = rows[rows['grp'] == 'researcher'].rename(columns={'k1': 'researcher'})
+    structure = rows[rows['grp'] == 'structure'].rename(columns={'k1': 'department', 'k2': 'team'})
+    types = rows[rows['grp'] == 'type'].rename(columns={'k1': 'activity_type', 'n': 'count'})
+    yearly = rows[rows['grp'] == 'year'].rename(columns={'k1': 'year', 'n': 'count'})
+    yearly = yearly.dropna(subset=['year']).astype({'year': int})
+
+    # السنة الأكثر نشاطاً (عند التساوي: الأصغر، كما في mode)
+    active = yearly.sort_values(['count', 'year'], ascending=[False, True])
+    result = {
+        'total': int(total['n']),
+        'researchers': int(total['researchers'] or 0),
+        'points': int(total['points']),
+        'active_year': int(active['year'].iloc[0]) if not active.empty else None,
+        'top_researchers': researchers.sort_values('points', ascending=False).head(5)[['researcher', 'points']].reset_index(drop=True),
+        'structure': structure[['department', 'team', 'points']].reset_index(drop=True),
+        'types': types[['activity_type', 'count']].reset_index(drop=True),
+        'yearly': yearly.sort_values('year')[['year', 'count']].reset_index(drop=True),
+    }
+    return aggregates_cache.set(key, result)
@@ -0,0 +1,84 @@
+from sqlalchemy import text
+from app.models import UNASSIGNED
+
+# جدول work_summary: عدد الأعمال ومجموع النقاط لكل (باحث، سنة، نوع نشاط)
+# يُحدّث بفروقات داخل معاملة الكتابة نفسها، ويُعاد بناؤه بالكامل لإصلاح أي انحراف
+
+# إضافة فرق إلى صف الملخص (INSERT ... ON CONFLICT مدعوم في PostgreSQL وSQLite 3.24+)
+UPSERT_SQL = text("""
+INSERT INTO work_summary (user_id, year, activity_type, works_count, points_sum)
+VALUES (:user_id, :year, :activity_type, :works_count, :points_sum)
+ON CONFLICT (user_id, year, activity_type) DO UPDATE SET
+    works_count = work_summary.works_count + excluded.works_count,
+    points_sum = work_summary.points_sum + excluded.points_sum
+""")
+# حذف الصفوف التي لم يعد لها أعمال
+PRUNE_SQL = text("""
+DELETE FROM work_summary
+WHERE user_id = :user_id AND year = :year AND activity_type = :activity_type AND works_count <= 0
+""")
+
+# تجميع الملخص من جدول الأعمال (نفس قواعد المفاتيح في summary_key)
+SUMMARY_SOURCE = f"""
+SELECT user_id, COALESCE(year, 0) AS year, COALESCE(activity_type, '{UNASSIGNED}') AS activity_type,
+    COUNT(*) AS works_count, COALESCE(SUM(points), 0) AS points_sum
+FROM works
+GROUP BY user_id, COALESCE(year, 0), COALESCE(activity_type, '{UNASSIGNED}')
+"""
+
+# مفتاح صف الملخص (السنة الفارغة = 0 والنوع الفارغ = UNASSIGNED)
+def summary_key(user_id, year, activity_type):
+    return (user_id, year or 0, activity_type or UNASSIGNED)
+
+# تطبيق فروقات أعمال على الملخص داخل الجلسة أو الاتصال الحالي (قبل التثبيت)
+# works: أزواج (user_id, year, activity_type, points)، sign: 1 للإضافة و-1 للحذف
+def record_works(conn, works, sign=1):
+    deltas = {}
+    for user_id, year, activity_type, points in works:
+        entry = deltas.setdefault(summary_key(user_id, year, activity_type), [0, 0])
+        entry[0] += sign
+        entry[1] += sign * int(points or 0)
+    rows = [
+        {'user_id': k[0], 'year': k[1], 'activity_type': k[2], 'works_count': n, 'points_sum': pts}
+        for k, (n, pts) in deltas.items() if n or pts
+    ]
+    if not rows:
+        return
+    conn.execute(UPSERT_SQL, rows)
+    removed = [r for r in rows if r['works_count'] < 0]
+    if removed:
+        conn.execute(PRUNE_SQL, [{'user_id': r['user_id'], 'year': r['year'], 'activity_type': r['activity_type']} for r in removed])
+
+# إعادة تعبئة الملخص من جدول الأعمال على اتصال داخل معاملة قائمة
+def refill_summary(conn):
+    conn.execute(text("DELETE FROM work_summary"))
+    conn.execute(text(
+        "INSERT INTO work_summary (user_id, year, activity_type, works_count, points_sum) "
+        f"SELECT user_id, year, activity_type, works_count, points_sum FROM ({SUMMARY_SOURCE}) src"
+    ))
+    return conn.execute(text("SELECT COUNT(*) FROM work_summary")).scalar()
+
+# إعادة بناء الملخص بالكامل في معاملة واحدة (لإصلاح الانحراف)
+def rebuild_summary(engine):
+    with engine.begin() as conn:
+        return refill_summary(conn)
+
+# عدد صفوف الملخص المختلفة عن التجميع الفعلي للأعمال (0 = متطابق)
+def summary_drift(engine):
+    stored = "SELECT user_id, year, activity_type, works_count, points_sum FROM work_summary"
+    with engine.connect() as conn:
+        missing = conn.execute(text(f"SELECT COUNT(*) FROM ({SUMMARY_SOURCE} EXCEPT {stored}) d")).scalar()
+        stale = conn.execute(text(f"SELECT COUNT(*) FROM ({stored} EXCEPT {SUMMARY_SOURCE}) d")).scalar()
+    return missing + stale
+
+if __name__ == "__main__":
+    import sys
+    from app.database import get_engine
+    engine = get_engine()
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    if command == "rebuild":
+        print(f"work_summary rebuilt: {rebuild_summary(engine)} rows")
+    else:
+        drift = summary_drift(engine)
+        print(f"work_summary drift: {drift} rows" + (" (run: python -m app.summary rebuild)" if drift else ""))
+        sys.exit(1 if drift else 0)
@@ -1,5 +1,7 @@
 import base64
+import json
 import os
+import re
 
 # تحويل صورة إلى base64 لتضمينها في المستندات أو التقارير
 def get_img_as_base64(file_path):
@@ -62,3 +64,27 @@ def download_file_from_url(url, file_path):
             return None
     except Exception as e:
         return None
+
+# الحركات والتطويل وعلامات القرآن تُحذف قبل الفهرسة والبحث
+_TASHKEEL = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+# توحيد أشكال الألف والياء والتاء المربوطة والهمزات على الواو والياء
+_ARABIC_FORMS = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه'})
+_WORD = re.compile(r"\w+")
+
+# تطبيع النص العربي للبحث: نفس الدالة للنص المفهرس ولعبارة البحث
+def normalize_arabic(text):
+    if not text:
+        return ""
+    text = _TASHKEEL.sub("", str(text)).translate(_ARABIC_FORMS).lower()
+    return " ".join(_WORD.findall(text))
+
+# نص البحث المخزن مع العمل: العنوان وقيم التفاصيل مطبعة
+def work_search_text(title, details=None):
+    if isinstance(details, str):
+        try:
+            details = json.loads(details) if details.strip() else None
+        except ValueError:
+            details = {'': details}
+    values = [str(v) for v in details.values() if isinstance(v, (str, int, float))] if isinstance(details, dict) else []
+    return normalize_arabic(" ".join([str(title or "")] + values))
+
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from sqlalchemy import text
+from app import auth
+from app.auth import auth_user, login_throttle
+from benchmarks.seed import make_engine, seed_database
+
+PASSWORD = "secret-pass"
+
+# كلمات مرور حقيقية لعدد من المستخدمين بكلفة قديمة لاختبار إعادة التشفير
+def prepare(n_users=50, legacy_rounds=10):
+    engine = make_engine()
+    seed_database(engine, n_works=0)
+    h = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(legacy_rounds)).decode()
+    with engine.begin() as conn:
+        usernames = [r[0] for r in conn.execute(text("SELECT username FROM users ORDER BY id LIMIT :n"), {'n': n_users})]
+        conn.execute(text("UPDATE users SET password_hash = :h WHERE username = :u"), [{'h': h, 'u': u} for u in usernames])
+    return usernames
+
+def _rate(fn, items, concurrency):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fn, items))
+    return results, len(items) / (time.perf_counter() - t0)
+
+def run(concurrency=20, rounds=12):
+    auth.BCRYPT_ROUNDS = rounds
+    usernames = prepare()
+    login_throttle.reset(*[('user', u) for u in usernames])
+
+    # أول دخول: تحقق بالكلفة القديمة + إعادة تشفير شفافة
+    results, first_rate = _rate(lambda u: auth_user(u, PASSWORD, "10.0.0.1"), usernames, concurrency)
+    assert all(results)
+    results, warm_rate = _rate(lambda u: auth_user(u, PASSWORD, None), usernames, concurrency)
+    assert all(results)
+
+    # هجوم تخمين: بعد تجاوز الحد تُرفض المحاولات دون أي تشفير
+    attempts = [usernames[0]] * 200
+    _, brute_rate = _rate(lambda u: auth_user(u, "wrong", "10.0.0.66"), attempts, concurrency)
+    return {
+        'first_login_per_s': round(first_rate, 1),
+        'login_per_s': round(warm_rate, 1),
+        'rejected_attempts_per_s': round(brute_rate, 1),
+    }
+
+if __name__ == "__main__":
+    print(run())
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+import plotly.express as px
+from app.charts import dashboard_figures, figure_cache
+from app.services import aggregates_cache, dashboard_aggregates, dataset_cache, get_smart_data
+from benchmarks.seed import make_engine, seed_database
+
+ADMIN = SimpleNamespace(id=1, role='admin', team_id=None, department_id=None)
+
+# حجم JSON المرسل إلى المتصفح لكل مخطط
+def payload_sizes(figures):
+    return {name: len(fig.to_json()) for name, fig in figures.items() if fig is not None}
+
+# الطريقة السابقة: مخطط دائري من صفوف الأعمال كاملة
+def legacy_pie_size():
+    df = get_smart_data(ADMIN)
+    return len(px.pie(df, names='activity_type', hole=0.5).to_json())
+
+def run(sizes=(5_000, 20_000, 100_000), tolerance=1.10):
+    results = []
+    for n_works in sizes:
+        seed_database(make_engine(), n_works=n_works)
+        for cache in (dataset_cache, aggregates_cache, figure_cache):
+            cache.clear()
+        scope = ('admin', None)
+        figures = dashboard_figures(scope, dashboard_aggregates(scope))
+        results.append({'works': n_works, 'figures': payload_sizes(figures), 'legacy_pie': legacy_pie_size()})
+
+    # حجم المخططات المجمعة لا يتبع عدد الأعمال (هامش صغير لطول الأرقام فقط)
+    smallest = results[0]['figures']
+    for r in results[1:]:
+        for name, size in r['figures'].items():
+            assert size <= smallest[name] * tolerance, f"{name}: {smallest[name]} -> {size} bytes at {r['works']} works"
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        sizes = " ".join(f"{name}={size / 1024:.1f}KiB" for name, size in r['figures'].items())
+        print(f"works={r['works']:>7} {sizes} legacy_pie={r['legacy_pie'] / 1024:.1f}KiB")
@@ -0,0 +1,37 @@
+import random
+import time
+from datetime import date, timedelta
+import pandas as pd
+from app import pdf_utils
+from app.auth import CurrentUser
+from app.pdf_utils import generate_cv_pdf
+from benchmarks.seed import ACTIVITY_TYPES
+
+# باحث افتراضي مع عدد محدد من الأعمال
+def sample_researcher(n_works=500, seed=7):
+    rnd = random.Random(seed)
+    user = CurrentUser(1, "researcher", "الباحث التجريبي", 'researcher', 'permanent', 1, "فرقة الدراسات الفلسفية", None, None)
+    dates = [date(2005, 1, 1) + timedelta(days=rnd.randrange(7000)) for _ in range(n_works)]
+    df = pd.DataFrame({
+        'title': [f"دراسة في الفلسفة الاجتماعية المعاصرة رقم {i % 120}" for i in range(n_works)],
+        'activity_type': [rnd.choice(ACTIVITY_TYPES) for _ in range(n_works)],
+        'publication_date': dates,
+        'year': [d.year for d in dates],
+    })
+    return user, df
+
+def _render(user, df):
+    t0 = time.perf_counter()
+    generate_cv_pdf(user, df)
+    return time.perf_counter() - t0
+
+def run(n_works=500, warm_runs=5):
+    user, df = sample_researcher(n_works)
+    # بارد: أول مستند في العملية مع ذاكرة تشكيل النصوص فارغة
+    pdf_utils._shape.cache_clear()
+    cold = _render(user, df)
+    warm = min(_render(user, df) for _ in range(warm_runs))
+    return {'works': n_works, 'cold_s': round(cold, 4), 'warm_s': round(warm, 4), 'shape_cache': pdf_utils._shape.cache_info()._asdict()}
+
+if __name__ == "__main__":
+    print(run())
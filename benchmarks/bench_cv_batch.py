@@ -0,0 +1,22 @@
+import os
+import time
+from app.cv_batch import generate_scope_cvs
+from benchmarks.seed import make_engine, seed_database
+
+# 200 باحث: 5 أقسام × 4 فرق × 10 أعضاء
+def run(worker_counts=None, n_works=40_000):
+    engine = make_engine()
+    seed_database(engine, n_departments=5, teams_per_department=4, users_per_team=10, n_works=n_works)
+    worker_counts = worker_counts or sorted({1, 2, 4, os.cpu_count() or 1})
+    results = {}
+    for workers in worker_counts:
+        t0 = time.perf_counter()
+        generate_scope_cvs(('admin', None), workers=workers)
+        results[workers] = round(time.perf_counter() - t0, 2)
+    return results
+
+if __name__ == "__main__":
+    results = run()
+    base = results[min(results)]
+    for workers, seconds in results.items():
+        print(f"workers={workers:<3} {seconds:>8} s  speedup x{base / seconds:.2f}")
@@ -0,0 +1,79 @@
+import json
+import os
+import re
+import time
+from app.pdf_utils import (
+    _new_cv_document, _render_cv_header, _render_cv_sections, cv_identity, cv_sections,
+    ensure_font_exists, process_text_for_pdf,
+)
+from benchmarks.bench_cv import sample_researcher
+
+# التخطيط المرجعي المحفوظ في المستودع: [(عنوان النوع، [أسطر الأعمال])] قبل التشكيل لكل حجم
+GOLDEN_LAYOUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "cv_layout.json")
+
+def golden_sections(n):
+    with open(GOLDEN_LAYOUT, encoding="utf-8") as f:
+        layout = json.load(f).get(str(n))
+    if layout is None:
+        return None
+    return [(process_text_for_pdf(title), [process_text_for_pdf(line) for line in lines]) for title, lines in layout]
+
+# الحلقة السابقة (iterrows) للمقارنة الزمنية ولتطابق ملف PDF
+def legacy_render(user, df_works):
+    pdf = _new_cv_document(ensure_font_exists())
+    _render_cv_header(pdf, *cv_identity(user))
+    df_sorted = df_works.sort_values(by=['activity_type', 'year'], ascending=[True, False])
+    current_type = None
+    for index, row in df_sorted.iterrows():
+        if row['activity_type'] != current_type:
+            current_type = row['activity_type']
+            if pdf.get_y() > 250:
+                pdf.add_page()
+            else:
+                pdf.ln(3)
+            pdf.set_font("Amiri", '', 13)
+            pdf.set_text_color(30, 60, 140)
+            pdf.set_x(10)
+            pdf.cell(190, 8, process_text_for_pdf(f"• {current_type}"), ln=True, align='R')
+        pdf.set_text_color(0, 0, 0)
+        pdf.set_font("Amiri", '', 11)
+        pdf.set_x(10)
+        pdf.multi_cell(190, 6, process_text_for_pdf(f"- {str(row['title'])} ({str(row['publication_date'])})"), align='R')
+    return bytes(pdf.output())
+
+def grouped_render(user, df_works):
+    pdf = _new_cv_document(ensure_font_exists())
+    _render_cv_header(pdf, *cv_identity(user))
+    _render_cv_sections(pdf, cv_sections(df_works))
+    return bytes(pdf.output())
+
+# إزالة الحقول المتغيرة بين تشغيلين (تاريخ الإنشاء ومعرف الملف)
+def _normalize(pdf_bytes):
+    pdf_bytes = re.sub(rb"/CreationDate \(.*?\)", b"", pdf_bytes)
+    return re.sub(rb"/ID \[.*?\]", b"", pdf_bytes)
+
+def _time(fn, user, df, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(user, df)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4)
+
+def run(sizes=(50, 500, 2000), repeat=3):
+    results = []
+    for n in sizes:
+        user, df = sample_researcher(n)
+        # الأقسام تطابق التخطيط المحفوظ، وملف PDF يطابق ناتج الحلقة السابقة بايتاً ببايت
+        golden = golden_sections(n)
+        if golden is not None:
+            assert cv_sections(df) == golden, f"layout differs from {GOLDEN_LAYOUT} for {n} works"
+        assert _normalize(legacy_render(user, df)) == _normalize(grouped_render(user, df)), f"output differs for {n} works"
+        legacy, grouped = _time(legacy_render, user, df, repeat), _time(grouped_render, user, df, repeat)
+        results.append({'works': n, 'golden': golden is not None, 'legacy_s': legacy, 'grouped_s': grouped, 'speedup': round(legacy / grouped, 2)})
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        print(r)
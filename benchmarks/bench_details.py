@@ -0,0 +1,60 @@
+import io
+import json
+import time
+import pandas as pd
+from sqlalchemy import text
+from app.export import export_works_excel
+from app.migrations import migrate
+from app.services import WORKS_BASE_QUERY, build_scoped_query, dashboard_filter_conditions
+from benchmarks.seed import JOURNALS, make_engine, seed_database
+
+JOURNAL = JOURNALS[7]
+
+# الطريقة السابقة: تنزيل النص وفك JSON لكل صف ثم التصفية في بايثون
+def legacy_filter(engine):
+    df = pd.read_sql(text(WORKS_BASE_QUERY), engine)
+    decoded = df['details'].apply(lambda x: (json.loads(x) if isinstance(x, str) else None) or {})
+    return df[decoded.apply(lambda d: d.get('المجلة') == JOURNAL)]
+
+def sql_filter(engine):
+    conds, params = dashboard_filter_conditions(details={'المجلة': JOURNAL})
+    q, params = build_scoped_query(('admin', None), conditions=conds, params=params)
+    return pd.read_sql(q, engine, params=params)
+
+# التصدير السابق: نسخ الإطار وفك JSON لكل صف عبر apply
+def legacy_export(engine):
+    df = pd.read_sql(text(WORKS_BASE_QUERY), engine)
+    df['تفاصيل'] = df['details'].apply(lambda x: " | ".join(f"{k}:{v}" for k, v in ((json.loads(x) if isinstance(x, str) else None) or {}).items() if v))
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df.to_excel(writer, index=False)
+    return output.getvalue()
+
+def streaming_export(engine):
+    return export_works_excel(('admin', None))
+
+def _time(fn, engine, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(engine)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4)
+
+def run(n_works=100_000):
+    engine = make_engine()
+    seed_database(engine, n_works=n_works)
+    migrate(engine)
+    matched = len(sql_filter(engine))
+    assert matched > 0, "details filter matched no works"
+    assert len(legacy_filter(engine)) == matched
+    return {
+        'filter_legacy_s': _time(legacy_filter, engine),
+        'filter_sql_s': _time(sql_filter, engine),
+        'export_legacy_s': _time(legacy_export, engine, repeat=1),
+        'export_streaming_s': _time(streaming_export, engine, repeat=1),
+    }
+
+if __name__ == "__main__":
+    print(run())
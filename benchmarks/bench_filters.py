@@ -0,0 +1,80 @@
+import time
+from datetime import date
+import pandas as pd
+from sqlalchemy import text
+from app.filters import FilterEngine
+from app.services import WORKS_BASE_QUERY, UNASSIGNED
+from benchmarks.seed import make_engine, seed_database
+
+# سلسلة تغييرات المرشحات كما يُحدثها المستخدم في لوحة القيادة
+STEPS = [
+    dict(),
+    dict(year=2015),
+    dict(year=2015, dept=2),
+    dict(year=2015, dept=2, team=6),
+    dict(year=2015, dept=2, team=6, atype="كتاب"),
+    dict(dept=2, atype="كتاب"),
+]
+
+# الطريقة السابقة: قناع منطقي ونسخة جديدة من الإطار لكل مرشح
+def legacy_filter(df, year=None, dept=None, team=None, atype=None):
+    filtered = df
+    if year is not None:
+        filtered = filtered[filtered['year'] == year]
+    if dept is not None:
+        filtered = filtered[filtered['department_id'] == dept]
+    if team is not None:
+        filtered = filtered[filtered['team_id'] == team]
+    if atype is not None:
+        filtered = filtered[filtered['activity_type'] == atype]
+    return len(filtered)
+
+def _time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for step in STEPS:
+            fn(**step)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(STEPS)
+
+def run(sizes=(10_000, 100_000, 300_000), repeat=5):
+    results = []
+    for n_works in sizes:
+        engine = make_engine()
+        samples = seed_database(engine, n_works=n_works)
+        # عمل قديم دون تاريخ ولا سنة: يجب ألا يكسر الخيارات أو حدود التاريخ
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO works (user_id, title, activity_type) VALUES (:u, 'عمل دون تاريخ', 'كتاب')"),
+                         {'u': samples['researcher']['id']})
+        df = pd.read_sql(text(WORKS_BASE_QUERY), engine)
+        df['activity_type'] = df['activity_type'].fillna(UNASSIGNED)
+
+        t0 = time.perf_counter()
+        fe = FilterEngine(df)
+        build = time.perf_counter() - t0
+        assert UNASSIGNED not in fe.options('year'), "undated works listed as a year option"
+        sorted(fe.options('year'))
+        first, last = fe.date_bounds()
+        assert first is not None and last is not None and not pd.isna(last), "date bounds include undated works"
+        dated = pd.to_datetime(df['publication_date'])
+        assert fe.count(date_from=date(2015, 1, 1)) == int((dated >= pd.Timestamp(2015, 1, 1)).sum())
+        assert fe.count() == len(df)
+        for step in STEPS:
+            n = fe.count(**step)
+            assert n > 0, f"empty selection for {step}"
+            assert n == legacy_filter(df, **step)
+
+        results.append({
+            'works': n_works,
+            'build_seconds': round(build, 4),
+            'legacy_ms': round(_time(lambda **f: legacy_filter(df, **f), repeat) * 1000, 3),
+            'engine_ms': round(_time(fe.count, repeat) * 1000, 3),
+            'index_bytes': int(fe.memory_usage().sum()),
+        })
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        print(f"works={r['works']:>7} build={r['build_seconds'] * 1000:7.1f} ms legacy={r['legacy_ms']:8.3f} ms engine={r['engine_ms']:8.3f} ms index={r['index_bytes'] / 1024:8.1f} KiB")
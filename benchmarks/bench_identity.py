@@ -0,0 +1,34 @@
+from sqlalchemy import event
+from app.auth import bump_identity_version, get_current_user
+from benchmarks.seed import make_engine, seed_database
+
+# عدّ الاستعلامات المنفذة على المحرك أثناء تنفيذ دالة
+def count_queries(engine, fn):
+    statements = []
+    listener = lambda conn, cursor, statement, *a: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return len(statements), result
+
+def run():
+    engine = make_engine()
+    samples = seed_database(engine, n_works=1_000)
+    state = {'user_id': samples['leader']['id']}
+
+    first, user = count_queries(engine, lambda: get_current_user(state))
+    # الوصول إلى الفرقة والقسم يجب ألا يولد استعلامات كسولة إضافية
+    lazy, _ = count_queries(engine, lambda: (user.team_name, user.department_name))
+    rerun, _ = count_queries(engine, lambda: get_current_user(state))
+    # تعديل صف المستخدم (مثل تغيير كلمة المرور) يفرض تحديث اللقطة مرة واحدة
+    bump_identity_version(user.id)
+    refreshed, _ = count_queries(engine, lambda: get_current_user(state))
+    assert first == 1, f"identity lookup ran {first} queries"
+    assert lazy == 0 and rerun == 0, f"lazy={lazy} rerun={rerun}"
+    assert refreshed == 1, f"refresh ran {refreshed} queries"
+    return {'first_load_queries': first, 'relationship_queries': lazy, 'rerun_queries': rerun, 'refresh_queries': refreshed}
+
+if __name__ == "__main__":
+    print(run())
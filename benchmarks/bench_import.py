@@ -0,0 +1,43 @@
+import time
+import pandas as pd
+from app.importer import bulk_import_works
+from app.services import add_work_service
+from benchmarks.seed import make_engine, seed_database
+
+# ملف استيراد تجريبي بأسماء مستخدمي الباحثين
+def sample_frame(usernames, n_rows):
+    return pd.DataFrame({
+        'username': [usernames[i % len(usernames)] for i in range(n_rows)],
+        'title': [f"عمل مستورد {i}" for i in range(n_rows)],
+        'activity_type': "مقال في مجلة علمية",
+        'classification': "B",
+        'publication_date': pd.date_range("2015-01-01", periods=n_rows, freq="h").date,
+        'points': 5,
+    })
+
+def run(n_rows=5_000, batch_sizes=(100, 1000, 5000)):
+    engine = make_engine()
+    seed_database(engine, n_works=0)
+    with engine.connect() as conn:
+        usernames = [r[0] for r in conn.exec_driver_sql("SELECT username FROM users WHERE role = 'researcher'")]
+        ids = [r[0] for r in conn.exec_driver_sql("SELECT id FROM users WHERE role = 'researcher'")]
+    df = sample_frame(usernames, n_rows)
+
+    results = {}
+    t0 = time.perf_counter()
+    for i, rec in enumerate(df.head(1_000).to_dict('records')):
+        add_work_service(ids[i % len(ids)], rec['title'], None, rec['activity_type'], rec['classification'], rec['publication_date'], rec['points'])
+    elapsed = time.perf_counter() - t0
+    results['add_work_service'] = round(1_000 / elapsed, 1)
+
+    for size in batch_sizes:
+        t0 = time.perf_counter()
+        report = bulk_import_works(df, batch_size=size)
+        elapsed = time.perf_counter() - t0
+        assert report['inserted'] == n_rows, report['errors'][:5]
+        results[f'bulk_import(batch={size})'] = round(n_rows / elapsed, 1)
+    return results
+
+if __name__ == "__main__":
+    for name, rate in run().items():
+        print(f"{name:<26} {rate:>10} rows/s")
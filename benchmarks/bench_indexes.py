@@ -0,0 +1,69 @@
+import sys
+import time
+from datetime import date
+from sqlalchemy import inspect, text
+from app.database import configure_engine
+from app.migrations import migrate
+from app.services import AGGREGATES_QUERY, UNASSIGNED, build_scoped_query, dashboard_filter_conditions, scope_conditions
+from benchmarks.seed import make_engine, seed_database
+
+# الاستعلامات الممثلة للوحة القيادة وصفحة التسجيل
+def sample_queries(samples):
+    researcher, leader, head = samples['researcher'], samples['leader'], samples['dept_head']
+    queries = {
+        'researcher_scope': build_scoped_query(('user', researcher['id'])),
+        'team_scope': build_scoped_query(('team', leader['team_id'])),
+        'researcher_year': build_scoped_query(('user', researcher['id']), conditions=["w.year = :year"], params={'year': 2018}),
+        'signup_teams': (text("SELECT id, name FROM teams WHERE department_id = :d"), {'d': head['department_id']}),
+    }
+    conds, params = scope_conditions(('department', head['department_id']))
+    f_conds, f_params = dashboard_filter_conditions(date(2015, 1, 1), date(2016, 12, 31), atype="كتاب")
+    params.update(f_params)
+    where = "WHERE " + " AND ".join(conds + f_conds)
+    queries['dept_aggregates'] = (text(AGGREGATES_QUERY.format(na=UNASSIGNED, where=where)), params)
+    return queries
+
+# خطة التنفيذ حسب نوع قاعدة البيانات
+def explain(conn, q, params):
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    rows = conn.execute(text(prefix + str(q)), params).fetchall()
+    return [str(r[-1]) for r in rows]
+
+def measure(engine, queries, repeat=5):
+    report = {}
+    with engine.connect() as conn:
+        for name, (q, params) in queries.items():
+            best = None
+            assert conn.execute(q, params).first() is not None, f"{name}: no rows"
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                conn.execute(q, params).fetchall()
+                elapsed = time.perf_counter() - t0
+                best = elapsed if best is None else min(best, elapsed)
+            report[name] = {'seconds': round(best, 5), 'plan': explain(conn, q, params)}
+    return report
+
+def run(url=None, n_works=100_000):
+    engine = configure_engine(url) if url else make_engine()
+    samples = seed_database(engine, n_works=n_works)
+    queries = sample_queries(samples)
+    # إزالة كل الفهارس التي أنشأها create_all (بما فيها فهارس الترحيلات اللاحقة المعرفة في النماذج)
+    # لقياس الحالة السابقة دون أي فهرس
+    with engine.begin() as conn:
+        for table in ('works', 'users', 'teams'):
+            for index in inspect(conn).get_indexes(table):
+                # فهارس القيود الفريدة تبقى (تُحذف مع القيد فقط)
+                if index.get('duplicates_constraint') or index['name'].startswith('sqlite_autoindex'):
+                    continue
+                conn.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    before = measure(engine, queries)
+    migrate(engine)
+    after = measure(engine, queries)
+    return before, after
+
+if __name__ == "__main__":
+    before, after = run(sys.argv[1] if len(sys.argv) > 1 else None)
+    for name in before:
+        print(f"== {name}: {before[name]['seconds'] * 1000:.2f} ms -> {after[name]['seconds'] * 1000:.2f} ms")
+        print("   before:", " | ".join(before[name]['plan']))
+        print("   after: ", " | ".join(after[name]['plan']))
@@ -0,0 +1,60 @@
+import time
+import pandas as pd
+from sqlalchemy import text
+from app.listing import LISTING_QUERY, estimate_works_count, list_works
+from app.migrations import migrate
+from benchmarks.seed import make_engine, seed_database
+
+PAGE_SIZE = 50
+
+# الطريقة السابقة: تحميل كل أعمال النطاق ثم عرض صفحة منها
+def legacy_page(engine, page):
+    df = pd.read_sql(text(LISTING_QUERY), engine)
+    df = df.sort_values(['publication_date', 'id'], ascending=False)
+    return df.iloc[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+
+# الوصول إلى الصفحة رقم page بالمرور على المؤشرات (كما يفعل زر "التالي")
+def walk_cursors(scope, pages):
+    cursors, cursor = [None], None
+    for _ in range(pages):
+        _, cursor = list_works(scope, cursor, PAGE_SIZE)
+        if cursor is None:
+            break
+        cursors.append(cursor)
+    return cursors
+
+def _time(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run(sizes=(10_000, 100_000, 300_000), deep_page=100):
+    results = []
+    scope = ('admin', None)
+    for n_works in sizes:
+        engine = make_engine()
+        seed_database(engine, n_works=n_works)
+        migrate(engine)
+        cursors = walk_cursors(scope, deep_page)
+
+        # نفس الصفوف التي يعرضها الترقيم بالإزاحة
+        page, _ = list_works(scope, cursors[-1], PAGE_SIZE)
+        assert page['id'].tolist() == legacy_page(engine, len(cursors) - 1)['id'].tolist()
+
+        results.append({
+            'works': n_works,
+            'first_page_ms': round(_time(lambda: list_works(scope, None, PAGE_SIZE)) * 1000, 2),
+            'deep_page_ms': round(_time(lambda: list_works(scope, cursors[-1], PAGE_SIZE)) * 1000, 2),
+            'count_ms': round(_time(lambda: estimate_works_count(scope)) * 1000, 2),
+            'legacy_page_ms': round(_time(lambda: legacy_page(engine, 0), 1) * 1000, 2),
+            'page_bytes': int(page.memory_usage(deep=True).sum()),
+        })
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        print(f"works={r['works']:>7} first={r['first_page_ms']:7.2f} ms deep={r['deep_page_ms']:7.2f} ms count={r['count_ms']:7.2f} ms legacy={r['legacy_page_ms']:8.2f} ms page={r['page_bytes'] / 1024:.1f} KiB")
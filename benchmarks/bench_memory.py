@@ -0,0 +1,41 @@
+import pandas as pd
+from sqlalchemy import text
+from app.services import WORKS_BASE_QUERY, WORKS_COMPACT_QUERY, UNASSIGNED, compact_works_frame
+from benchmarks.seed import make_engine, seed_database
+
+# الإطار السابق: نصوص object مكررة، تواريخ date بايثون، والتفاصيل دائماً
+def legacy_frame(engine):
+    df = pd.read_sql(text(WORKS_BASE_QUERY), engine)
+    df['department'] = df['department'].fillna(UNASSIGNED)
+    df['team'] = df['team'].fillna(UNASSIGNED)
+    df['activity_type'] = df['activity_type'].fillna(UNASSIGNED)
+    df['publication_date'] = pd.to_datetime(df['publication_date']).dt.date
+    return df
+
+def compact_frame(engine):
+    return compact_works_frame(pd.read_sql(text(WORKS_COMPACT_QUERY), engine))
+
+# تقرير الذاكرة: البايتات لكل صف إجمالاً ولكل عمود
+def memory_report(df):
+    usage = df.memory_usage(deep=True, index=False)
+    rows = max(len(df), 1)
+    return {
+        'rows': len(df),
+        'total_bytes': int(usage.sum()),
+        'bytes_per_row': round(usage.sum() / rows, 1),
+        'columns': {col: round(n / rows, 1) for col, n in usage.items()},
+    }
+
+def run(n_works=100_000):
+    engine = make_engine()
+    seed_database(engine, n_works=n_works)
+    return {name: memory_report(fn(engine)) for name, fn in (("legacy", legacy_frame), ("compact", compact_frame))}
+
+if __name__ == "__main__":
+    report = run()
+    legacy, compact = report['legacy'], report['compact']
+    print(f"{'column':<18} {'legacy B/row':>13} {'compact B/row':>14}")
+    for col in legacy['columns']:
+        print(f"{col:<18} {legacy['columns'][col]:>13} {compact['columns'].get(col, '-'):>14}")
+    print(f"{'total':<18} {legacy['bytes_per_row']:>13} {compact['bytes_per_row']:>14}")
+    print(f"rows={compact['rows']} reduction={legacy['total_bytes'] / max(compact['total_bytes'], 1):.1f}x")
@@ -0,0 +1,30 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.database import configure_engine, pool_metrics, pool_status
+from app.services import build_scoped_query
+from benchmarks.seed import make_engine, seed_database
+
+# محاكاة جلسات متزامنة تستعلم نطاقات الباحثين عبر التجمع المشترك
+def run(url=None, sessions=50, requests_per_session=20, pool_size=5, n_works=20_000):
+    engine = make_engine(pool_size=pool_size)
+    samples = seed_database(engine, n_works=n_works)
+    if url:
+        engine = configure_engine(url, pool_size=pool_size)
+    q, params = build_scoped_query(('team', samples['leader']['team_id']))
+
+    def session_loop(_):
+        for _ in range(requests_per_session):
+            with engine.connect() as conn:
+                conn.execute(q, params).fetchall()
+
+    pool_metrics.reset()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session_loop, range(sessions)))
+    elapsed = time.perf_counter() - t0
+    return dict(pool_status(), seconds=round(elapsed, 3), requests_per_second=round(sessions * requests_per_session / elapsed, 1))
+
+if __name__ == "__main__":
+    for size in (5, 10, 20):
+        print(f"pool_size={size}:", run(sys.argv[1] if len(sys.argv) > 1 else None, pool_size=size))
@@ -0,0 +1,51 @@
+import time
+from types import SimpleNamespace
+import pandas as pd
+from app.services import WORKS_BASE_QUERY, build_scoped_query, get_user_scope
+from benchmarks.seed import make_engine, seed_database
+
+# الطريقة السابقة: تحميل كل الأعمال ثم التصفية في pandas بالأسماء
+def legacy_fetch(engine, role, u):
+    df = pd.read_sql(WORKS_BASE_QUERY, engine)
+    if role == 'admin':
+        return len(df), df
+    if role == 'dept_head':
+        return len(df), df[df['department_id'] == u['department_id']]
+    if role == 'leader':
+        return len(df), df[df['team_id'] == u['team_id']]
+    return len(df), df[df['user_id'] == u['id']]
+
+# الطريقة الجديدة: التقييد داخل SQL بمعاملات مربوطة
+def scoped_fetch(engine, role, u):
+    q, params = build_scoped_query(get_user_scope(SimpleNamespace(role=role, **_ids(u))))
+    df = pd.read_sql(q, engine, params=params)
+    return len(df), df
+
+def _ids(u):
+    return {'id': u['id'], 'team_id': u.get('team_id'), 'department_id': u.get('department_id')}
+
+def _time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fetched, df = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return fetched, len(df), best
+
+def run(n_works=100_000, repeat=3):
+    engine = make_engine()
+    samples = seed_database(engine, n_works=n_works)
+    results = []
+    for role, u in samples.items():
+        # نفس الصفوف بالطريقتين، ونطاق غير فارغ لكل دور
+        kept = {len(fn(engine, role, u)[1]) for fn in (legacy_fetch, scoped_fetch)}
+        assert len(kept) == 1 and kept != {0}, f"{role}: scoped rows differ or are empty: {kept}"
+        for name, fn in (("legacy", legacy_fetch), ("scoped", scoped_fetch)):
+            fetched, kept, best = _time(lambda: fn(engine, role, u), repeat)
+            results.append({'role': role, 'method': name, 'rows_fetched': fetched, 'rows_kept': kept, 'seconds': round(best, 4)})
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        print(f"{r['role']:<11} {r['method']:<7} fetched={r['rows_fetched']:>7} kept={r['rows_kept']:>7} {r['seconds'] * 1000:8.1f} ms")
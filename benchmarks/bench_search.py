@@ -0,0 +1,51 @@
+import time
+import pandas as pd
+from app.migrations import migrate
+from app.search import search_teams, search_works
+from app.services import build_scoped_query
+from benchmarks.seed import make_engine, seed_database
+
+# عبارات بحث ممثلة: بتشكيل وبدونه، بادئات، ومفردات من التفاصيل
+QUERIES = ["الهُوِيّة الثقافية", "الأسرة", "مجلة الحكمة", "التعليم العالي الجزائر", "المواطن", "دار الخلدونية"]
+
+# الطريقة السابقة: تحميل كل أعمال النطاق ثم str.contains على العنوان
+def legacy_search(engine, scope, query):
+    q, params = build_scoped_query(scope)
+    df = pd.read_sql(q, engine, params=params)
+    return df[df['title'].str.contains(query, regex=False, na=False)]
+
+def _time(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run(n_works=100_000):
+    engine = make_engine()
+    samples = seed_database(engine, n_works=n_works)
+    migrate(engine)
+    scopes = {'admin': ('admin', None), 'dept_head': ('department', samples['dept_head']['department_id']),
+              'researcher': ('user', samples['researcher']['id'])}
+
+    results = []
+    for query in QUERIES:
+        # كل المفردات موجودة في البيانات المولدة، والتشكيل لا يمنع التطابق
+        for role, scope in scopes.items():
+            df, _ = search_works(scope, query)
+            assert not df.empty, f"no hits for {query} in {role} scope"
+        df, _ = search_works(scopes['admin'], query)
+        row = {'query': query, 'hits_page': len(df), 'teams': len(search_teams(query))}
+        for role, scope in scopes.items():
+            row[f'{role}_ms'] = round(_time(lambda: search_works(scope, query)) * 1000, 2)
+        row['deep_page_ms'] = round(_time(lambda: search_works(scopes['admin'], query, page=20)) * 1000, 2)
+        row['legacy_ms'] = round(_time(lambda: legacy_search(engine, scopes['admin'], query), 1) * 1000, 2)
+        results.append(row)
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        print(f"{r['query']:<28} hits={r['hits_page']:>3} teams={r['teams']:>2} admin={r['admin_ms']:7.2f} ms dept={r['dept_head_ms']:7.2f} ms "
+              f"researcher={r['researcher_ms']:7.2f} ms page20={r['deep_page_ms']:7.2f} ms legacy={r['legacy_ms']:8.2f} ms")
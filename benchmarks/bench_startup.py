@@ -0,0 +1,82 @@
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.seed import make_engine, seed_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# تشغيل صفحة الدخول كما يفعل streamlit run (وضع bare دون خادم)؛ أي استثناء يُنهي العملية بخطأ
+LOGIN_PAGE = """
+import runpy
+runpy.run_path({main!r}, run_name="__main__")
+print("page rendered")
+"""
+# مجموعة الاستيرادات السابقة في أعلى main.py (كل الصفحات محملة مسبقاً)
+EAGER_IMPORTS = """
+import streamlit, plotly.express
+import app.auth, app.services, app.export, app.pdf_utils, app.cv_batch, app.filters, app.charts, app.org
+"""
+SCENARIOS = {
+    'login_page': LOGIN_PAGE.format(main=os.path.join(ROOT, "app", "main.py")),
+    'eager_imports': EAGER_IMPORTS,
+}
+
+# قراءة تقرير -X importtime: (الوحدة، الزمن الذاتي، الزمن التراكمي بالميكروثانية، المستوى)
+def parse_importtime(stderr):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+def profile(code, env):
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    # زمن بدء صفحة لم تكتمل لا يقيس عرضاً حقيقياً
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError("startup script failed:\n" + "\n".join(errors[-20:]))
+    rows = parse_importtime(proc.stderr)
+    # الوحدات ذات المستوى الأعلى (depth=0) مجموعها هو زمن الاستيراد الكلي
+    top_level = [r for r in rows if r[3] == 0]
+    heavy = sorted(top_level, key=lambda r: r[2], reverse=True)[:10]
+    return {
+        'wall_s': wall,
+        'import_s': sum(r[2] for r in top_level) / 1e6,
+        'modules': len(rows),
+        'heavy': [(name, round(cum / 1000, 1)) for name, _, cum, _ in heavy],
+        'loaded': {r[0] for r in rows},
+    }
+
+def run(repeat=5):
+    # قاعدة صغيرة حتى لا يتوقف الاتصال الأولي في main.py
+    path = os.path.join(tempfile.mkdtemp(prefix="lab_startup_"), "startup.db")
+    seed_database(make_engine(path), n_works=0)
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", PYTHONPATH=ROOT)
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        runs = [profile(code, env) for _ in range(repeat)]
+        best = min(runs, key=lambda r: r['import_s'])
+        results[name] = {
+            'wall_s': round(statistics.median(r['wall_s'] for r in runs), 3),
+            'import_s': round(statistics.median(r['import_s'] for r in runs), 3),
+            'modules': best['modules'],
+            'heavy_ms': best['heavy'],
+            'loads': {m: m in best['loaded'] for m in ('pandas', 'plotly', 'fpdf', 'arabic_reshaper', 'bidi', 'requests', 'xlsxwriter', 'numpy')},
+        }
+    return results
+
+if __name__ == "__main__":
+    for name, r in run().items():
+        loaded = ", ".join(m for m, on in r['loads'].items() if on) or "-"
+        print(f"{name:<14} wall={r['wall_s'] * 1000:7.0f} ms imports={r['import_s'] * 1000:7.0f} ms modules={r['modules']:>5} heavy loaded: {loaded}")
+        for module, ms in r['heavy_ms']:
+            print(f"    {module:<40} {ms:8.1f} ms")
@@ -0,0 +1,58 @@
+import time
+from datetime import date
+import pandas as pd
+from sqlalchemy import text
+from app.services import (AGGREGATES_QUERY, SUMMARY_AGGREGATES_QUERY, UNASSIGNED,
+                          add_work_service, delete_work_service, update_work_service)
+from app.summary import rebuild_summary, summary_drift
+from benchmarks.seed import make_engine, seed_database
+
+def _aggregate(engine, query, where="", params=None):
+    rows = pd.read_sql(text(query.format(na=UNASSIGNED, where=where)), engine, params=params or {})
+    rows['points'] = rows['points'].fillna(0).astype(int)
+    return rows.sort_values(['grp', 'k1', 'k2'], na_position='first').reset_index(drop=True)
+
+def _time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run(sizes=(10_000, 100_000, 300_000), repeat=3):
+    results = []
+    for n_works in sizes:
+        engine = make_engine()
+        samples = seed_database(engine, n_works=n_works)
+
+        # نفس النتائج من الجدولين (المجموعات والأعداد والنقاط)
+        works_rows = _aggregate(engine, AGGREGATES_QUERY)
+        summary_rows = _aggregate(engine, SUMMARY_AGGREGATES_QUERY)
+        cols = ['grp', 'k1', 'k2', 'n', 'points']
+        assert works_rows[cols].astype(str).equals(summary_rows[cols].astype(str)), "summary aggregates differ"
+
+        # الكتابة تحدث الملخص في نفس المعاملة دون انحراف
+        uid = samples['researcher']['id']
+        assert add_work_service(uid, "عمل للقياس", None, "كتاب", "A", date(2020, 5, 1), 7)
+        wid = pd.read_sql(text("SELECT MAX(id) AS id FROM works"), engine)['id'].iloc[0]
+        assert update_work_service(int(wid), "عمل للقياس (معدل)", date(2018, 3, 1))
+        assert delete_work_service(int(wid) - 1)
+        drift = summary_drift(engine)
+        assert drift == 0, f"summary drift after writes: {drift}"
+
+        with engine.connect() as conn:
+            summary_size = conn.execute(text("SELECT COUNT(*) FROM work_summary")).scalar()
+        results.append({
+            'works': n_works,
+            'summary_rows': summary_size,
+            'works_ms': round(_time(lambda: _aggregate(engine, AGGREGATES_QUERY), repeat) * 1000, 2),
+            'summary_ms': round(_time(lambda: _aggregate(engine, SUMMARY_AGGREGATES_QUERY), repeat) * 1000, 2),
+            'rebuild_ms': round(_time(lambda: rebuild_summary(engine), 1) * 1000, 2),
+        })
+    return results
+
+if __name__ == "__main__":
+    for r in run():
+        print(f"works={r['works']:>7} summary_rows={r['summary_rows']:>6} works={r['works_ms']:8.2f} ms summary={r['summary_ms']:8.2f} ms rebuild={r['rebuild_ms']:8.2f} ms")
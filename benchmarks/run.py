@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import bcrypt
+from app import auth
+from app.auth import CurrentUser, auth_user, login_throttle
+from app.cv_batch import load_scope_members
+from app.export import export_works_excel
+from app.filters import FilterEngine
+from app.pdf_utils import generate_cv_pdf
+from app.services import aggregates_cache, dashboard_aggregates, dataset_cache, get_smart_data, get_user_scope
+from benchmarks.seed import make_engine, seed_database
+
+PASSWORD = "bench-pass"
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# مرشحات لوحة القيادة الممثلة لتفاعل المستخدم
+DASHBOARD_FILTERS = [
+    dict(),
+    dict(year=2015),
+    dict(atype="مقال في مجلة علمية"),
+    dict(year=2018, atype="كتاب"),
+]
+
+# زمن دالة: أدنى قيمة ووسيط عدة تشغيلات (before() يُستدعى قبل كل تشغيل دون احتسابه)
+def measure(fn, repeat=3, before=None):
+    runs = []
+    for _ in range(repeat):
+        if before:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {'min_s': round(min(runs), 5), 'median_s': round(statistics.median(runs), 5), 'runs': len(runs)}
+
+# النطاق المقيس يجب ألا يكون فارغاً، وإلا فالأزمنة لا تقيس شيئاً
+def _require(n, what):
+    assert n, f"{what}: empty scope"
+    return n
+
+def _user(u):
+    return SimpleNamespace(id=u['id'], role=u['role'], team_id=u.get('team_id'), department_id=u.get('department_id'))
+
+# البيانات لكل دور: بارد (ذاكرة مؤقتة فارغة) ودافئ
+def bench_smart_data(samples, repeat):
+    out = {}
+    for role, u in samples.items():
+        user = _user(u)
+        out[role] = {
+            'rows': _require(len(get_smart_data(user)), f"get_smart_data[{role}]"),
+            'cold': measure(lambda: get_smart_data(user), repeat, before=dataset_cache.clear),
+            'warm': measure(lambda: get_smart_data(user), repeat),
+        }
+    return out
+
+# تجميعات لوحة القيادة في قاعدة البيانات ومحرك التصفية في الذاكرة
+def bench_dashboard(samples, repeat):
+    out = {}
+    for role in ('admin', 'dept_head'):
+        user = _user(samples[role])
+        scope = get_user_scope(user)
+        run_all = lambda: [dashboard_aggregates(scope, **f) for f in DASHBOARD_FILTERS]
+        df = get_smart_data(user)
+        _require(len(df), f"dashboard[{role}]")
+        fe = FilterEngine(df)
+        out[role] = {
+            'aggregates': measure(run_all, repeat, before=aggregates_cache.clear),
+            'filter_engine_build': measure(lambda: FilterEngine(fe.frame), repeat),
+            'filter_engine_select': measure(lambda: [fe.count(**f) for f in DASHBOARD_FILTERS], repeat),
+        }
+    return out
+
+def bench_export(samples, repeat):
+    out = {}
+    for role in ('admin', 'dept_head'):
+        scope = get_user_scope(_user(samples[role]))
+        data = export_works_excel(scope)
+        _require(data, f"export_excel[{role}]")
+        out[role] = {'bytes': len(data or b""), **measure(lambda: export_works_excel(scope), repeat)}
+    return out
+
+def bench_cv(samples, repeat):
+    u = samples['researcher']
+    _, works = load_scope_members(('user', u['id']))
+    df = works.get(u['id'])
+    _require(df is not None and len(df), "generate_cv_pdf[researcher]")
+    user = CurrentUser(u['id'], u['username'], u['full_name'], u['role'], u.get('member_type'), u.get('team_id'), None, u.get('department_id'), None)
+    return {'works': len(df), **measure(lambda: generate_cv_pdf(user, df), repeat)}
+
+def bench_auth(samples, repeat):
+    users = [u['username'] for u in samples.values()]
+    login_throttle.reset(*[('user', name) for name in users])
+    ok = measure(lambda: [auth_user(name, PASSWORD) for name in users], repeat)
+    bad = measure(lambda: auth_user(users[0], "wrong"), 1)
+    login_throttle.reset(('user', users[0]))
+    return {'rounds': auth.BCRYPT_ROUNDS, 'logins': len(users), 'success': ok, 'failure': bad}
+
+SUITE = {
+    'get_smart_data': bench_smart_data,
+    'dashboard': bench_dashboard,
+    'export_excel': bench_export,
+    'generate_cv_pdf': bench_cv,
+    'auth_user': bench_auth,
+}
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# تشغيل المجموعة كاملة على قاعدة مُعبأة حديثاً
+def run(url=None, departments=5, teams=4, users=10, works=100_000, repeat=3, only=None, seed=42):
+    engine = make_engine(url=url)
+    password_hash = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(auth.BCRYPT_ROUNDS)).decode()
+    t0 = time.perf_counter()
+    samples = seed_database(engine, departments, teams, users, works, seed=seed, password_hash=password_hash)
+    seed_s = time.perf_counter() - t0
+
+    results = {}
+    for name, fn in SUITE.items():
+        if only and name not in only:
+            continue
+        results[name] = fn(samples, repeat)
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'dialect': engine.dialect.name,
+            'dataset': {'departments': departments, 'teams_per_department': teams, 'users_per_team': users, 'works': works, 'seed': seed},
+            'seed_s': round(seed_s, 3),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+# مقارنة الوسيط مع ملف نتائج سابق (نسبة > 1 تعني تراجعاً)
+def compare(previous, current, prefix=""):
+    rows = []
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        if isinstance(value, dict) and 'median_s' in value and isinstance(old, dict) and old.get('median_s'):
+            rows.append((prefix + key, old['median_s'], value['median_s'], value['median_s'] / old['median_s']))
+        elif isinstance(value, dict):
+            rows.extend(compare(old or {}, value, f"{prefix}{key}."))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء خدمات التطبيق على بيانات تجريبية")
+    parser.add_argument("--url", help="رابط قاعدة بيانات فارغة (افتراضياً SQLite مؤقت)")
+    parser.add_argument("--departments", type=int, default=5)
+    parser.add_argument("--teams", type=int, default=4, help="عدد الفرق في كل قسم")
+    parser.add_argument("--users", type=int, default=10, help="عدد الباحثين في كل فرقة")
+    parser.add_argument("--works", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", choices=list(SUITE), help="تشغيل قياسات محددة فقط")
+    parser.add_argument("--output", help="ملف النتائج JSON (افتراضياً benchmarks/results/<التاريخ>-<commit>.json)")
+    parser.add_argument("--compare", help="ملف نتائج سابق للمقارنة")
+    args = parser.parse_args(argv)
+
+    report = run(args.url, args.departments, args.teams, args.users, args.works, args.repeat, args.only, args.seed)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['commit'] or 'local'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"results: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        for name, old, new, ratio in compare(previous['results'], report['results']):
+            flag = "  <-- slower" if ratio > 1.2 else ""
+            print(f"{name:<50} {old * 1000:9.2f} ms -> {new * 1000:9.2f} ms  x{ratio:5.2f}{flag}")
+
+if __name__ == "__main__":
+    main()
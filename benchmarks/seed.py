@@ -0,0 +1,104 @@
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+from app.database import configure_engine
+from app.models import Base, Department, Team, User, Work
+from app.summary import refill_summary
+from app.utils import work_search_text
+
+ACTIVITY_TYPES = ["مقال في مجلة علمية", "مداخلة في مؤتمر", "كتاب", "فصل في كتاب", "إشراف على رسالة"]
+CLASSIFICATIONS = ["A", "B", "C", "Q1", "Q2", "Q3"]
+
+# مفردات لتوليد عناوين وأسماء عربية واقعية الطول والتنوع
+SUBJECTS = ["الهوية الثقافية", "التحولات الاجتماعية", "فلسفة الأخلاق", "الخطاب الديني", "التعليم العالي",
+            "الأسرة", "المواطنة", "الذاكرة الجماعية", "الهجرة غير الشرعية", "العولمة", "الفكر النقدي",
+            "اللغة والمجتمع", "الشباب الجامعي", "الإعلام الرقمي", "التراث الشعبي", "العنف الرمزي"]
+CONTEXTS = ["المجتمع الجزائري", "الفكر العربي المعاصر", "الوسط الجامعي", "المدينة الجزائرية",
+            "الفضاء الرقمي", "المغرب العربي", "الفلسفة الحديثة"]
+TITLE_FORMS = ["دراسة في {s}", "{s}: مقاربة سوسيولوجية", "قراءة نقدية في {s}", "إشكالية {s} في {c}",
+               "{s} وأثرها على {t}", "نحو فهم جديد لـ{s} في {c}", "{s} بين النظرية والتطبيق"]
+JOURNALS = ["مجلة العلوم الإنسانية", "مجلة الدراسات الفلسفية", "مجلة الباحث الاجتماعي", "مجلة آفاق فكرية",
+            "مجلة الحكمة", "مجلة العلوم الاجتماعية", "مجلة دراسات إنسانية", "مجلة الناصرية", "مجلة المواقف"]
+CONFERENCES = ["الملتقى الوطني حول", "المؤتمر الدولي حول", "اليوم الدراسي حول", "الندوة العلمية حول"]
+CITIES = ["الجزائر", "وهران", "قسنطينة", "تلمسان", "سطيف", "بجاية"]
+PUBLISHERS = ["دار الخلدونية", "ديوان المطبوعات الجامعية", "دار الأمة", "منشورات الاختلاف", "دار الهدى"]
+FIRST_NAMES = ["محمد", "أحمد", "فاطمة", "خديجة", "عبد القادر", "يوسف", "مريم", "سعاد", "كريم", "نور الدين", "أمينة", "رشيد"]
+LAST_NAMES = ["بن علي", "بوزيد", "حمداني", "سعيدي", "بلقاسم", "زروقي", "مرابط", "بن يوسف", "قاسمي", "عمراني"]
+
+# إنشاء محرك محلي للقياس وجعله المحرك المشترك للتطبيق (SQLite مؤقت أو رابط صريح)
+def make_engine(path=None, url=None, **overrides):
+    if url is None:
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(prefix="lab_bench_"), "bench.db")
+        url = f"sqlite:///{path}"
+    return configure_engine(url, **overrides)
+
+def random_title(rnd):
+    form = rnd.choice(TITLE_FORMS)
+    return form.format(s=rnd.choice(SUBJECTS), t=rnd.choice(SUBJECTS), c=rnd.choice(CONTEXTS))
+
+# تفاصيل JSON حسب نوع النشاط (نفس المفاتيح المفهرسة في DETAIL_KEYS)
+def random_details(rnd, activity_type):
+    if activity_type == "مقال في مجلة علمية":
+        return {'المجلة': rnd.choice(JOURNALS), 'العدد': rnd.randint(1, 40), 'الصفحات': f"{rnd.randint(1, 200)}-{rnd.randint(201, 400)}"}
+    if activity_type == "مداخلة في مؤتمر":
+        return {'المؤتمر': f"{rnd.choice(CONFERENCES)} {rnd.choice(SUBJECTS)}", 'المكان': rnd.choice(CITIES)}
+    if activity_type in ("كتاب", "فصل في كتاب"):
+        return {'الناشر': rnd.choice(PUBLISHERS), 'ISBN': f"978-9947-{rnd.randint(10, 99)}-{rnd.randint(100, 999)}-{rnd.randint(0, 9)}"}
+    return None
+
+# تعبئة قاعدة بيانات تجريبية بالأقسام والفرق والمستخدمين والأعمال
+# password_hash: تجزئة واحدة مشتركة لكل المستخدمين (لقياس المصادقة)، "-" تعني حسابات غير قابلة للدخول
+def seed_database(engine, n_departments=5, teams_per_department=4, users_per_team=10, n_works=100_000, seed=42, password_hash="-"):
+    rnd = random.Random(seed)
+    Base.metadata.create_all(engine)
+    person = lambda: f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+
+    depts, teams, users = [], [], []
+    for d in range(1, n_departments + 1):
+        depts.append({'id': d, 'name_ar': f"قسم {rnd.choice(SUBJECTS)} {d}", 'short_name': f"D{d}"})
+        for _ in range(teams_per_department):
+            t_id = len(teams) + 1
+            teams.append({'id': t_id, 'name': f"فرقة {rnd.choice(SUBJECTS)} {t_id}", 'department_id': d,
+                          'keywords': "، ".join(rnd.sample(SUBJECTS, 3)), 'domains': rnd.choice(CONTEXTS)})
+
+    users.append({'id': 1, 'username': "admin", 'full_name': "المدير", 'password_hash': password_hash, 'role': 'admin'})
+    for d in depts:
+        users.append({'id': len(users) + 1, 'username': f"head{d['id']}", 'full_name': person(),
+                      'password_hash': password_hash, 'role': 'dept_head', 'department_id': d['id']})
+    for t in teams:
+        for i in range(users_per_team):
+            users.append({'id': len(users) + 1, 'username': f"r{t['id']}_{i}", 'full_name': person(),
+                          'password_hash': password_hash, 'role': 'leader' if i == 0 else 'researcher',
+                          'member_type': rnd.choice(['permanent', 'permanent', 'associate', 'phd_student']),
+                          'team_id': t['id'], 'department_id': t['department_id']})
+
+    # executemany يأخذ الأعمدة من أول قاموس: نفس المفاتيح لكل المستخدمين (None للغائب)
+    user_keys = ('member_type', 'team_id', 'department_id')
+    users = [dict(dict.fromkeys(user_keys), **u) for u in users]
+
+    authors = [u['id'] for u in users if u['role'] in ('leader', 'researcher')]
+    start = date(2010, 1, 1)
+    works = []
+    for i in range(1, n_works + 1):
+        pub = start + timedelta(days=rnd.randrange(5000))
+        atype = rnd.choice(ACTIVITY_TYPES)
+        title, details = random_title(rnd), random_details(rnd, atype)
+        works.append({'id': i, 'user_id': rnd.choice(authors), 'title': title, 'details': details, 'search_text': work_search_text(title, details),
+                      'activity_type': atype, 'classification': rnd.choice(CLASSIFICATIONS),
+                      'publication_date': pub, 'year': pub.year, 'points': rnd.randint(1, 20)})
+
+    with engine.begin() as conn:
+        conn.execute(Department.__table__.insert(), depts)
+        conn.execute(Team.__table__.insert(), teams)
+        conn.execute(User.__table__.insert(), users)
+        if works:
+            conn.execute(Work.__table__.insert(), works)
+        refill_summary(conn)
+
+    # مستخدم نموذجي لكل دور لاستخدامه في القياسات
+    samples = {}
+    for u in users:
+        samples.setdefault(u['role'], u)
+    return samples